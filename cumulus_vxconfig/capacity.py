@@ -0,0 +1,185 @@
+'''
+Capacity of the address spaces and ID pools of a project, computed from
+master.yml and the allocations saved in the state files. The free space
+is computed with IP sets and the number of blocks that can still be
+allocated is derived arithmetically from the free CIDRs, no host or
+subnet is enumerated.
+'''
+import collections
+
+import netaddr
+
+from cumulus_vxconfig.utils import Host, Network
+from cumulus_vxconfig.utils.project import Project
+
+IP_NETWORK_TYPES = ['ip', 'sub_interface']
+
+
+def network_capacity(network, used, prefixlens=()):
+    '''
+    Return the capacity of a base network given the networks allocated in
+    it:
+    {
+        "network": "10.1.0.0/16", "size": 65536, "used": 1024,
+        "free": 64512, "utilization": 1.56,
+        "largest_free_block": "10.1.128.0/17",
+        "free_blocks": {"17": 1, "18": 1, ...},
+        "available": {"24": 252}
+    }
+    'free_blocks' counts the free CIDRs per prefix length (fragmentation)
+    and 'available' the subnets of each of 'prefixlens' that can still
+    be allocated.
+    '''
+    network = Network(network)
+    width = 32 if network.version == 4 else 128
+    base = netaddr.IPSet([network.cidr])
+    used = netaddr.IPSet(
+        netaddr.cidr_merge([netaddr.IPNetwork(net) for net in used])
+    ) & base
+    free = (base - used).iter_cidrs()
+
+    free_blocks = collections.Counter(net.prefixlen for net in free)
+    largest = min(free, key=lambda net: net.prefixlen, default=None)
+
+    available = {}
+    for prefixlen in sorted(set(prefixlens)):
+        available[str(prefixlen)] = sum(
+            net.size >> (width - prefixlen) for net in free
+            if net.prefixlen <= prefixlen
+        )
+
+    return {
+        'network': str(network.cidr),
+        'size': base.size,
+        'used': used.size,
+        'free': base.size - used.size,
+        'utilization': round(100.0 * used.size / base.size, 2),
+        'largest_free_block': str(largest) if largest is not None else None,
+        'free_blocks': {str(k): v for k, v in sorted(free_blocks.items())},
+        'available': available,
+    }
+
+
+def address_capacity(network, indexes):
+    '''
+    Return the capacity of a base network of addresses allocated by index
+    (see Network.get_ip), given the index of each host or rack:
+    {
+        "network": "10.0.1.0/24", "size": 254, "used": 4,
+        "highest_index": 42, "free": 212, "utilization": 16.54,
+        "exhausted": []
+    }
+    The addresses are not packed, 'free' counts the addresses after the
+    highest index and 'exhausted' lists the hosts or racks whose index is
+    out of the network (they fail with 'Run out of IP addresses').
+    '''
+    first, last = Network(network).usable_range
+    size = last - first + 1
+
+    # get_ip takes 1..size, and the indexes <= 0 from the last address
+    highest = max([i for i in indexes.values() if i > 0], default=0)
+    exhausted = sorted(
+        name for name, i in indexes.items() if not 1 - size <= i <= size
+    )
+
+    return {
+        'network': network,
+        'size': size,
+        'used': len(indexes),
+        'highest_index': highest,
+        'free': max(size - highest, 0),
+        'utilization': round(100.0 * min(highest, size) / size, 2),
+        'exhausted': exhausted,
+    }
+
+
+def pool_capacity(pool, used):
+    ''' Return the remaining IDs of an ID pool given the allocated IDs '''
+    used = len(set(int(i) for i in used if int(i) in pool))
+
+    return {
+        'pool': '{}-{}'.format(pool[0], pool[-1]),
+        'size': len(pool),
+        'used': used,
+        'free': len(pool) - used,
+    }
+
+
+def capacity(project=None):
+    '''
+    Return the capacity report of a project:
+    {
+        "networks": {
+            "vlans": {...}, "external_connectivity": {...},
+            "loopbacks": {"leaf": {...}, ...}, "vxlan_anycast": {...}
+        },
+        "pools": {
+            "clag": {"rack01": {...}}, "l3vni": {...}, "nat": {...}
+        }
+    }
+    '''
+    from cumulus_vxconfig.configvars import (
+        CLAG_IDS, L3VNI_IDS, NAT_RULE_IDS
+    )
+
+    project = project if project is not None else Project.default()
+    mf = project.master
+    topology = project.inventory.topology
+    base_networks = mf['base_networks']
+
+    networks = collections.OrderedDict()
+
+    # VLANs networks, /24 by default or the prefixlen of the VLAN
+    vlans_network = project.state('vlans_network').data
+    prefixlens = {24} | {
+        int(vlan['prefixlen'])
+        for vlans in mf['vlans'].values() for vlan in vlans
+        if 'prefixlen' in vlan
+    }
+    networks['vlans'] = network_capacity(
+        base_networks['vlans'],
+        [v['network_prefix'] for v in vlans_network.values()],
+        prefixlens
+    )
+
+    # Point-to-point networks of the network links
+    link_networks = list(project.state('ip_network_links').data.values())
+    for name, v in mf['network_links'].items():
+        if v['interface_type'] not in IP_NETWORK_TYPES:
+            continue
+        if name not in base_networks:
+            continue
+
+        base = netaddr.IPNetwork(base_networks[name])
+        networks[name] = network_capacity(
+            base_networks[name],
+            [net for net in link_networks if netaddr.IPNetwork(net) in base],
+            [v.get('prefixlen', 30)]
+        )
+
+    # Loopbacks (the address of the host id) and vxlan anycast (the
+    # address of the rack id)
+    networks['loopbacks'] = collections.OrderedDict(
+        (group, address_capacity(subnet, {
+            host: Host(host).id for host in topology.group_hosts.get(group, ())
+        }))
+        for group, subnet in base_networks['loopbacks'].items()
+    )
+    networks['vxlan_anycast'] = address_capacity(
+        base_networks['vxlan_anycast'],
+        {rack: Host(hosts[0]).rack_id
+         for rack, hosts in topology.rack_hosts.items()}
+    )
+
+    clag_interfaces = project.state('clag_interfaces').data
+    pools = collections.OrderedDict()
+    pools['clag'] = collections.OrderedDict(
+        (rack, pool_capacity(CLAG_IDS, ids.values()))
+        for rack, ids in sorted(clag_interfaces.items())
+    )
+    pools['l3vni'] = pool_capacity(
+        L3VNI_IDS, [v['id'] for v in project.state('l3vni').data.values()]
+    )
+    pools['nat'] = pool_capacity(NAT_RULE_IDS, project.state('nat_rules').data)
+
+    return {'networks': networks, 'pools': pools}
@@ -1,15 +1,22 @@
 import argparse
 import json
-from cumulus_vxconfig.configvars import ConfigVars
 
-configvars = ConfigVars()
-dirs = dir(configvars)
+FORMATS = ['json', 'yaml', 'json-ref']
 
-methods = []
-for item in dirs:
-    if (hasattr(getattr(configvars, item), '__call__')
-            and not item.startswith('_')):
-        methods.append(item)
+
+def dumps(result, fmt='json'):
+    '''
+    Format a configuration variable. 'yaml' and 'json-ref' write the
+    structures repeated across hosts once (YAML anchors and aliases, JSON
+    references).
+    '''
+    from cumulus_vxconfig.utils.filters import Filters
+
+    if fmt == 'yaml':
+        return Filters().yaml_format(result, share=True).rstrip('\n')
+    elif fmt == 'json-ref':
+        return json.dumps(Filters().json_ref(result), separators=(',', ':'))
+    return json.dumps(result, indent=4)
 
 
 def main():
@@ -24,6 +31,24 @@ def main():
         help="Name of configuration variable.",
     )
 
+    parser.add_argument(
+        "--host",
+        dest="host",
+        action="store",
+        help="Print the configuration variable of a host only.",
+    )
+
+    parser.add_argument(
+        "--format",
+        dest="format",
+        action="store",
+        choices=FORMATS,
+        default="json",
+        help=("Output format of --config: json (default), yaml (repeated "
+              "structures as anchors and aliases) or json-ref (repeated "
+              "structures as references)."),
+    )
+
     parser.add_argument(
         "--list",
         dest="config_list",
@@ -31,20 +56,294 @@ def main():
         help="List of configuration variables.",
     )
 
+    parser.add_argument(
+        "--check",
+        dest="check",
+        action="store_true",
+        help="Run every check of master.yml and report all the errors.",
+    )
+
+    parser.add_argument(
+        "--max-errors",
+        dest="max_errors",
+        action="store",
+        type=int,
+        help="Report the first N errors only (with --check).",
+    )
+
+    parser.add_argument(
+        "--export",
+        dest="export",
+        action="store",
+        metavar="DIR",
+        help=("Write the configuration variables of each host to "
+              "DIR/<host>.json (e.g. host_vars/), only the changed files "
+              "are rewritten."),
+    )
+
+    parser.add_argument(
+        "--capacity",
+        dest="capacity",
+        action="store_true",
+        help=("Report the free and used space of the base networks and "
+              "the remaining IDs of the ID pools, from the state files."),
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        dest="snapshot",
+        action="store",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help=("Save the configuration variables of each host as the "
+              "deployed snapshot (default: ./.cumulus_snapshot.json)."),
+    )
+
+    parser.add_argument(
+        "--compile",
+        dest="compile",
+        action="store",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help=("Write the configuration variables of each host as a "
+              "compiled snapshot that the Ansible forks map in memory "
+              "(default: ./.cumulus_snapshot.bin)."),
+    )
+
+    parser.add_argument(
+        "--diff",
+        dest="diff",
+        action="store",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help=("Print the per-host changes against the deployed snapshot "
+              "(default: ./.cumulus_snapshot.json)."),
+    )
+
+    parser.add_argument(
+        "--limit-hosts",
+        dest="limit_hosts",
+        action="store_true",
+        help=("With --diff, print the changed hosts only, as an Ansible "
+              "--limit pattern ('!all', matching no host, when no host "
+              "changed)."),
+    )
+
+    parser.add_argument(
+        "--projects",
+        dest="projects",
+        action="store",
+        nargs="+",
+        metavar="DIR",
+        help=("Process many projects (directories or glob patterns) in "
+              "one invocation, with --config, --check, --export, "
+              "--capacity or --serve. With --socket only, the name of the "
+              "served project to query."),
+    )
+
+    parser.add_argument(
+        "--migrate-state",
+        dest="migrate_state",
+        action="store_true",
+        help=("Copy the state files of ~/.cumulus_vxconfig (earlier "
+              "versions) into the state directory of the project of the "
+              "current directory, before the run. For the one project "
+              "deployed with that directory only."),
+    )
+
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        action="store",
+        metavar="FILE",
+        help=("Write the metrics of the run (durations, peak RSS, sizes, "
+              "allocations, state bytes written, cache hit ratios) to FILE "
+              "in the Prometheus textfile format, e.g. "
+              "/var/lib/node_exporter/cumulus_vxconfig.prom."),
+    )
+
+    parser.add_argument(
+        "--serve",
+        dest="serve",
+        action="store_true",
+        help=("Keep the configuration variables warm in memory and serve "
+              "them over a Unix socket."),
+    )
+
+    parser.add_argument(
+        "--socket",
+        dest="socket",
+        action="store",
+        help=("Path of the Unix socket (default: "
+              "./.cumulus_getconfig.sock). Without --serve, query a "
+              "running server instead of computing the variables."),
+    )
+
     config = parser.parse_args()
 
-    if config.config_list:
+    from cumulus_vxconfig.utils import File
+
+    # The state files are written here, at the end of the run, the atexit
+    # hook of File is a fallback only
+    if not config.metrics_file:
+        try:
+            return run(parser, config)
+        finally:
+            File.flush()
+
+    from cumulus_vxconfig.utils.project import Project
+
+    project = Project.default()
+    success = False
+    try:
+        run(parser, config)
+        success = True
+    finally:
+        project.flush()
+        File.flush()
+        project.metrics.set('success', int(success))
+        project.metrics.collect(project)
+        project.metrics.write(config.metrics_file)
+
+
+def run(parser, config):
+    ''' Run the command of the parsed arguments '''
+    if config.migrate_state:
+        from cumulus_vxconfig.utils.project import Project, migrate_state
+
+        project = Project.default()
+        copied = migrate_state(project)
+        print('{}: {} state file(s) copied'.format(
+            project.state_dir, len(copied)
+        ))
+
+    if config.serve:
+        from cumulus_vxconfig.server import serve
+
+        if config.projects:
+            from cumulus_vxconfig.projects import expand_projects, open_project
+
+            serve(config.socket, projects=[
+                open_project(path)
+                for path in expand_projects(config.projects)
+            ])
+        else:
+            serve(config.socket)
+    elif config.projects and not config.socket:
+        from cumulus_vxconfig import projects
+
+        if config.configvar:
+            task, options = projects.config_variable, {
+                'name': config.configvar, 'host': config.host
+            }
+        elif config.check:
+            task, options = projects.check, {'max_errors': config.max_errors}
+        elif config.export:
+            task, options = projects.export, {'directory': config.export}
+        elif config.capacity:
+            task, options = projects.capacity, {}
+        else:
+            parser.error(
+                '--projects requires --config, --check, --export or '
+                '--capacity'
+            )
+
+        paths = projects.expand_projects(config.projects)
+        results = projects.run_projects(paths, task, **options)
+        print(json.dumps(dict(results), indent=4))
+        if not all(
+                v['ok'] and not (config.check and v['result'])
+                for _, v in results):
+            parser.exit(1)
+    elif config.check:
+        from cumulus_vxconfig.utils.checkvars import CheckVars, format_errors
+
+        errors = CheckVars(collect=True).check_all()
+        if errors:
+            parser.exit(1, format_errors(errors, config.max_errors) + '\n')
+        print('master.yml: no errors found')
+    elif config.export:
+        from cumulus_vxconfig.export import export_host_vars
+
+        index = export_host_vars(config.export)
+        print('{}: {} changed, {} unchanged, {} removed'.format(
+            config.export, len(index['changed']), len(index['unchanged']),
+            len(index['removed'])
+        ))
+    elif config.capacity:
+        from cumulus_vxconfig.capacity import capacity
+
+        print(json.dumps(capacity(), indent=4))
+    elif config.snapshot is not None:
+        from cumulus_vxconfig.export import host_variables
+        from cumulus_vxconfig.snapshot import save_snapshot
+
+        save_snapshot(host_variables(), config.snapshot or None)
+    elif config.compile is not None:
+        from cumulus_vxconfig.compiled import write_compiled
+        from cumulus_vxconfig.export import host_variables
+
+        write_compiled(host_variables(), config.compile or None)
+    elif config.diff is not None:
+        from cumulus_vxconfig.export import host_variables
+        from cumulus_vxconfig.snapshot import diff_hosts, limit, load_snapshot
+
+        delta = diff_hosts(
+            load_snapshot(config.diff or None), host_variables()
+        )
+        if config.limit_hosts:
+            print(limit(delta))
+        else:
+            print(json.dumps(delta, indent=4))
+    elif config.socket:
+        from cumulus_vxconfig.server import query
+
+        if config.config_list:
+            request = 'list'
+        elif config.configvar:
+            request = ' '.join(
+                item for item in ['get', config.configvar, config.host]
+                if item is not None
+            )
+            if config.projects:
+                request = '@{} {}'.format(config.projects[0], request)
+        else:
+            parser.error('--socket requires --serve, --config or --list')
+
+        response = query(request, config.socket)
+        if not response['ok']:
+            parser.exit(1, response['error'] + '\n')
+        if config.config_list:
+            print('\nConfiguration variables')
+            print('=======================')
+            print('{}\n'.format('\n'.join(response['result'])))
+        else:
+            print(dumps(response['result'], config.format))
+    elif config.config_list:
+        from cumulus_vxconfig.configvars import variable_names
+
         print('\nConfiguration variables')
         print('=======================')
-        print('{}\n'.format('\n'.join(methods)))
+        print('{}\n'.format('\n'.join(variable_names())))
     elif config.configvar:
-        method = getattr(configvars, config.configvar)
+        from cumulus_vxconfig.configvars import ConfigVars
+
+        _configvars = ConfigVars()
+        method = getattr(_configvars, config.configvar)
+        with _configvars.project.metrics.timer(
+                'variable_duration_seconds', variable=config.configvar):
+            result = method()
+        if config.host is not None:
+            result = result[config.host]
         try:
-            print(json.dumps(method(), indent=4))
+            print(dumps(result, config.format))
         except json.decoder.JSONDecodeError:
-            print(method())
+            print(result)
         except TypeError:
-            print(method())
+            print(result)
 
 
 if __name__ == "__main__":
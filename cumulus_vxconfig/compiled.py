@@ -0,0 +1,185 @@
+'''
+Compiled snapshot of the per-host configuration variables: one file,
+written once per run, that the Ansible forks map in memory and read their
+own host from, without parsing the variables of the other hosts.
+
+Layout (little endian):
+    header   magic 'CVXSNAP1', number of hosts (u32), reserved (u32)
+    index    per host, sorted by name: name offset (u64), name length (u32),
+             data offset (u64), data length (u32)
+    names    the host names, UTF-8
+    data     the variables of each host, compact JSON
+'''
+import json
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b'CVXSNAP1'
+HEADER = struct.Struct('<8sII')
+ENTRY = struct.Struct('<QIQI')
+
+
+def default_compiled():
+    return os.path.join(os.getcwd(), '.cumulus_snapshot.bin')
+
+
+def write_compiled(hosts, path=None):
+    '''
+    Write the per-host variables (see 'export.host_variables') as a
+    compiled snapshot, atomically: the readers that already mapped the
+    previous file keep reading it.
+    '''
+    path = path or default_compiled()
+    items = sorted(
+        (host.encode(), json.dumps(v, separators=(',', ':')).encode())
+        for host, v in hosts.items()
+    )
+
+    names_offset = HEADER.size + ENTRY.size * len(items)
+    data_offset = names_offset + sum(len(name) for name, _ in items)
+
+    index, names, data = [], [], []
+    for name, content in items:
+        index.append(ENTRY.pack(
+            names_offset, len(name), data_offset, len(content)
+        ))
+        names.append(name)
+        data.append(content)
+        names_offset += len(name)
+        data_offset += len(content)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(items), 0))
+        f.writelines(index)
+        f.writelines(names)
+        f.writelines(data)
+    os.replace(tmp, path)
+
+    return path
+
+
+class CompiledSnapshot:
+    '''
+    Read-only, memory-mapped compiled snapshot. A host is found by a
+    binary search of the index and its variables are a slice of the
+    mapping, they are only copied when decoded.
+
+    Example:
+        with CompiledSnapshot('.cumulus_snapshot.bin') as snapshot:
+            snapshot.get('leaf01')['mlag_bonds']
+    '''
+    def __init__(self, path=None):
+        self.path = path or default_compiled()
+        with open(self.path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            self.signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if st.st_size < HEADER.size:
+                raise ValueError('not a compiled snapshot: ' + self.path)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError('not a compiled snapshot: ' + self.path)
+        if self._size() != len(self._mm):
+            self._mm.close()
+            raise ValueError('truncated compiled snapshot: ' + self.path)
+
+        self._view = memoryview(self._mm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        ''' Unmap the file, the slices returned by 'raw' must be released '''
+        self._view.release()
+        self._mm.close()
+
+    def _size(self):
+        ''' Size of the file given by the header and the last entry '''
+        if self.count == 0:
+            return HEADER.size
+        if HEADER.size + ENTRY.size * self.count > len(self._mm):
+            return None
+        entry = self._entry(self.count - 1)
+        return entry[2] + entry[3]
+
+    def _entry(self, idx):
+        return ENTRY.unpack_from(self._mm, HEADER.size + ENTRY.size * idx)
+
+    def _find(self, host):
+        key = host.encode()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            name = self._mm[entry[0]:entry[0] + entry[1]]
+            if name == key:
+                return entry
+            elif name < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return None
+
+    def __contains__(self, host):
+        return self._find(host) is not None
+
+    def __len__(self):
+        return self.count
+
+    def hosts(self):
+        ''' Return the host names, sorted '''
+        hosts = []
+        for idx in range(self.count):
+            entry = self._entry(idx)
+            hosts.append(self._mm[entry[0]:entry[0] + entry[1]].decode())
+        return hosts
+
+    def raw(self, host):
+        ''' Return the JSON of a host variables as a slice of the mapping '''
+        entry = self._find(host)
+        if entry is None:
+            raise KeyError(host)
+
+        return self._view[entry[2]:entry[2] + entry[3]]
+
+    def get(self, host, name=None):
+        '''
+        Return the variables of a host, or one variable only if 'name'
+        '''
+        with self.raw(host) as raw:
+            variables = json.loads(raw.tobytes())
+
+        return variables if name is None else variables[name]
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def host_vars(host, path=None, name=None):
+    '''
+    Return the variables of a host from a compiled snapshot. The snapshot
+    is mapped once per process and mapped again when the file is
+    replaced.
+    '''
+    path = os.path.abspath(path or default_compiled())
+    st = os.stat(path)
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    with _snapshots_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is None or snapshot.signature != signature:
+            if snapshot is not None:
+                snapshot.close()
+            snapshot = _snapshots[path] = CompiledSnapshot(path)
+
+        return snapshot.get(host, name)
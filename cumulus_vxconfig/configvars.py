@@ -1,28 +1,72 @@
 import collections
-import copy
+import functools
 import itertools
+import sys
 
+from cumulus_vxconfig.utils.addrplan import AddressPlan
+from cumulus_vxconfig.utils.adjacency import FabricAdjacency
 from cumulus_vxconfig.utils.checkvars import CheckVars
 from cumulus_vxconfig.utils.filters import Filters
+from cumulus_vxconfig.utils.records import (
+    Bond, Bridge, IpInterface, L2Svi, L3Svi, Neighbor, UnnumberedInterface,
+    VxlanInterface, as_dict
+)
 from cumulus_vxconfig.utils import (
-    File, Inventory, Host, MACAddr, Network, Link
+    Host, MACAddr, Network, Link, VlanTable
 )
+from cumulus_vxconfig.utils.project import Project
 
 from ansible.errors import AnsibleError
 
 filter = Filters()
-inventory = Inventory()
-mf = File().master()
+
+# ID pools of the allocations saved in the state files
+CLAG_IDS = range(1, 200)
+L3VNI_IDS = range(4000, 4091)
+NAT_RULE_IDS = range(500, 600, 10)
+
+
+def cached(func):
+    '''
+    Cache the result of a method per ConfigVars instance, the results are
+    released with the instance (a functools.lru_cache on the method would
+    keep up to 128 instances alive, e.g. across the server refreshes).
+    '''
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self):
+        hit = name in self._cache
+        self.project.metrics.cache('configvars.' + name, hit)
+        if not hit:
+            self._cache[name] = func(self)
+        return self._cache[name]
+
+    return wrapper
+
+
+def variable_names():
+    ''' Return the names of the configuration variables '''
+    return [
+        item for item in dir(ConfigVars)
+        if not item.startswith('_') and callable(getattr(ConfigVars, item))
+    ]
 
 
 class ConfigVars:
     '''
     Class that transform and simplify the configuration variables
     define in https://github.com/rynldtbuen/cumulus-evpn-vxlan-ansible
+
+    The variables are built against a 'Project', default to the project
+    of the current directory.
     '''
-    # def __init__(self):
-        # Check for overlapping interfaces
-        # CheckVars().interfaces
+    def __init__(self, project=None):
+        self.project = project if project is not None else Project.default()
+        self.mf = self.project.master
+        self.inventory = self.project.inventory
+        self.checkvars = CheckVars(self.project)
+        self._cache = {}
 
     def loopback_ips(self):
         '''
@@ -39,7 +83,7 @@ class ConfigVars:
             vxlan_anycast: '192.168.8.0/23'
         '''
         # Check for overlapping networks
-        base_networks = CheckVars().base_networks
+        base_networks = self.checkvars.base_networks
 
         lo, clag = base_networks['loopbacks'], base_networks['vxlan_anycast']
         clag_net = Network(clag)
@@ -47,14 +91,14 @@ class ConfigVars:
         loopback = {}
         for group, subnet in lo.items():
             lo_net = Network(subnet)
-            for host in inventory.hosts(group):
+            for host in self.inventory.hosts(group):
                 _host = Host(host)
                 ips = {'ip_addresses': [], 'clag_vxlan_anycast_ip': None}
 
                 lo_ip = lo_net.get_ip(_host.id, lo=True)
                 ips['ip_addresses'].append(lo_ip)
 
-                if host in inventory.hosts('leaf'):
+                if self.inventory.in_group(host, 'leaf'):
                     ips['clag_vxlan_anycast_ip'] = (
                         clag_net.get_ip(_host.rack_id, addr=True)
                     )
@@ -63,9 +107,39 @@ class ConfigVars:
 
         return loopback
 
-    def _vlans(self, key=None):
+    def _l3vni(self, master_vlans):
         '''
-        Build a tenant vlans and l3vni variable.
+        Generate a l3vni id each tenant and save it on l3vni.json file.
+        '''
+        l3vni = self.project.state('l3vni')
+
+        ids = [v['id'] for k, v in l3vni.data.items()]
+        available_vnis = iter([
+            r for r in L3VNI_IDS if str(r) not in ids
+        ])
+
+        for tenant in master_vlans.keys():
+            if tenant not in l3vni.data.keys() and tenant != 'default':
+                vni = next(available_vnis)
+                vlan = 'vlan' + str(vni)
+                l3vni.data[tenant] = {
+                    'id': str(vni), 'name': 'l3vni',
+                    'type': 'l3', 'vlan': vlan, 'tenant': tenant
+                }
+                self.project.metrics.inc('allocations', pool='l3vni')
+
+        for tenant in l3vni.data.copy().keys():
+            if tenant not in master_vlans.keys():
+                del l3vni.data[tenant]
+
+        return l3vni.dump()
+
+    @cached
+    def _vlans(self):
+        '''
+        Build a tenant vlans and l3vni table. The table is built once and
+        its indexes ('by_id', 'by_vlan', 'by_tenant', 'by_type' and
+        'l3vni') are read-only views.
 
         Required variables in master.yml
         --------------------------------
@@ -74,66 +148,10 @@ class ConfigVars:
             - { id: '100', name: 'vlan100'}
             tenant02:
             - { id: '500', name: 'vlan500'}
-
-        Parameters
-        ---------
-        key: str
-            valid options: ['vlan', 'id', tenant', 'name', 'type']
-            Set the dict key of choice for easy reference of variable
         '''
-        master_vlans = CheckVars().vlans
+        master_vlans = self.checkvars.vlans
 
-        def _l3vni():
-            '''
-            Generate a l3vni id each tenant and save it on l3vni.json file.
-            '''
-            l3vni = File('l3vni')
-
-            ids = [v['id'] for k, v in l3vni.data.items()]
-            available_vnis = iter([
-                r for r in range(4000, 4091) if str(r) not in ids
-            ])
-
-            for tenant in master_vlans.keys():
-                if tenant not in l3vni.data.keys() and tenant != 'default':
-                    vni = next(available_vnis)
-                    vlan = 'vlan' + str(vni)
-                    l3vni.data[tenant] = {
-                        'id': str(vni), 'name': 'l3vni',
-                        'type': 'l3', 'vlan': vlan, 'tenant': tenant
-                    }
-
-            for tenant in l3vni.data.copy().keys():
-                if tenant not in master_vlans.keys():
-                    del l3vni.data[tenant]
-
-            return l3vni.dump()
-
-        if key is not None:
-            x = collections.defaultdict(list)
-            for tenant, vlans in copy.deepcopy(master_vlans).items():
-                for index, vlan in enumerate(vlans):
-                    vlan.update({
-                        'tenant': tenant, 'type': 'l2',
-                        'vlan': 'vlan' + vlan['id'], 'index': index
-                    })
-                vlans.append(_l3vni()[tenant])
-                for k, v in itertools.groupby(vlans, lambda x: x[key]):
-                    x[k].extend(list(v))
-
-            groupby = collections.defaultdict(dict)
-            for k, v in x.items():
-                if len(v) > 1:
-                    for _k, _v in itertools.groupby(v, lambda x: x['id']):
-                        for item in _v:
-                            groupby[k][_k] = item
-                else:
-                    for item in v:
-                        groupby[k] = item
-
-            return groupby
-
-        return master_vlans
+        return VlanTable(master_vlans, self._l3vni(master_vlans))
 
     def mlag_peerlink(self):
         '''
@@ -143,18 +161,21 @@ class ConfigVars:
         -------------------------------
         mlag_peerlink_interfaces: 'swp23-24'
         '''
-        racks = list(CheckVars().mlag_bonds.keys())
-        interfaces = CheckVars().mlag_peerlink_interfaces
+        return self._mlag_peerlink(self.inventory.hosts('leaf'))
+
+    def _mlag_peerlink(self, hosts):
+        ''' Build the mlag peerlink variable of the leafs 'hosts' '''
+        racks = list(self.checkvars.mlag_bonds.keys())
+        interfaces = self.checkvars.mlag_peerlink_interfaces
         lo = self.loopback_ips()
 
         mlag_peerlink = {}
-        single_leaf = False
-        for host in inventory.hosts('leaf'):
+        for host in hosts:
             _host = Host(host)
+            single_leaf = False
+            peer = next((p for p in _host.peer_hosts if p in lo), None)
             try:
-                backup_ip = (
-                    lo[_host.peer_host]['ip_addresses'][0].split('/')[0]
-                )
+                backup_ip = lo[peer]['ip_addresses'][0].split('/')[0]
             except KeyError:
                 single_leaf = True
 
@@ -162,7 +183,7 @@ class ConfigVars:
                 msg = ("\033[1;35mWARNING: Non-MLAG deployment is not "
                        "supported: {} does not have a peer switch "
                        "({}) in inventory")
-                print(msg.format(host, _host.peer_host))
+                print(msg.format(host, _host.peer_host), file=sys.stderr)
             else:
                 system_mac = MACAddr('44:38:39:FF:01:00') - _host.rack_id
 
@@ -182,9 +203,10 @@ class ConfigVars:
 
         return mlag_peerlink
 
-    def mlag_bonds(self):
+    @cached
+    def _rack_bonds(self):
         '''
-        Build a clag ids and bonds variable.
+        Build a clag ids and bonds records of each rack.
 
         Required variable in master.yml
         -------------------------------
@@ -194,14 +216,14 @@ class ConfigVars:
             rack02:
             - { name: server02, members: 'swp1', vids: '500' }
         '''
-        mlag_bonds = CheckVars().mlag_bonds
+        mlag_bonds = self.checkvars.mlag_bonds
 
         def _clag_interfaces():
             '''
             Generate a unique clag id of a bond and save it on
             clag_interfaces.json file.
             '''
-            clag_ifaces = File('clag_interfaces')
+            clag_ifaces = self.project.state('clag_interfaces')
 
             for rack, bonds in mlag_bonds.items():
                 try:
@@ -211,7 +233,7 @@ class ConfigVars:
                     clag_ifaces.data[rack] = {}
 
                 available_ids = iter(
-                    [r for r in range(1, 200) if r not in existing_ids]
+                    [r for r in CLAG_IDS if r not in existing_ids]
                 )
 
                 for index, bond in enumerate(bonds, start=1):
@@ -219,6 +241,7 @@ class ConfigVars:
                         clag_ifaces.data[rack][bond['name']] = (
                             next(available_ids)
                         )
+                        self.project.metrics.inc('allocations', pool='clag')
 
             for rack, bonds in clag_ifaces.data.copy().items():
                 if rack in mlag_bonds.keys():
@@ -232,7 +255,7 @@ class ConfigVars:
             return clag_ifaces.dump()
 
         clag_id = _clag_interfaces()
-        master_vlans = self._vlans(key='id')
+        master_vlans = self._vlans().by_id
 
         rack_bonds = {}
         for rack, bonds in mlag_bonds.items():
@@ -247,28 +270,53 @@ class ConfigVars:
                 vids = ','.join(filter.cluster(_vids))
                 members = ','.join(filter.uncluster(bond['members']))
                 alias = '{}.{}.{}'.format(tenant, rack, cid)
-                _bonds.append({
-                    'name': bond['name'], 'vids': vids, 'clag_id': cid,
-                    'tenant': tenant, 'members': members, 'alias': alias
-                })
+                _bonds.append(
+                    Bond(bond['name'], vids, cid, tenant, members, alias)
+                )
 
             _bridge = collections.defaultdict(list)
-            for k, v in itertools.groupby(_bonds, lambda x: x['vids']):
+            for k, v in itertools.groupby(_bonds, lambda x: x.vids):
                 for item in v:
-                    _bridge[k].append(item['name'])
+                    _bridge[k].append(item.name)
             bridge = []
             for k, v in _bridge.items():
                 mode = 'access' if len(filter.uncluster(k)) == 1 else 'vids'
-                bridge.append({'mode': mode, 'vids': k, 'bonds': ','.join(v)})
+                bridge.append(Bridge(mode, k, ','.join(v)))
 
             rack_bonds[rack] = {'bonds': _bonds, 'bridge': bridge}
 
+        return rack_bonds
+
+    def _host_bonds(self):
+        ''' Return the rack bonds records assign to a host. '''
+        rack_bonds = self._rack_bonds()
+
         host_bonds = {}
         for rack, bonds in rack_bonds.items():
-            for host in Inventory().hosts('leaf'):
-                _host = Host(host)
-                if _host.rack == rack:
-                    host_bonds[host] = bonds
+            for host in self.inventory.topology.rack_hosts.get(rack, []):
+                host_bonds[host] = bonds
+
+        return host_bonds
+
+    def mlag_bonds(self):
+        '''
+        Build a clag ids and bonds variable. Data is derive from
+        self._rack_bonds.
+
+        Required variable in master.yml
+        -------------------------------
+        mlag_bonds:
+            rack01:
+            - { name: server01, members: 'swp1', vids: '100' }
+            rack02:
+            - { name: server02, members: 'swp1', vids: '500' }
+        '''
+        rack_bonds = {k: as_dict(v) for k, v in self._rack_bonds().items()}
+
+        host_bonds = {}
+        for rack, bonds in rack_bonds.items():
+            for host in self.inventory.topology.rack_hosts.get(rack, []):
+                host_bonds[host] = bonds
 
         return host_bonds
 
@@ -276,43 +324,43 @@ class ConfigVars:
     def _host_vlans(self):
         '''
         Return a list of all the vlans including l3vni assign to a host.
-        Data is derive from 'self.mlag_bond' and 'self._vlans'.
+        Data is derive from 'self._host_bonds' and 'self._vlans'.
         '''
-        master_vlans = self._vlans(key='id')
-        host_bonds = self.mlag_bonds()
+        vlans = self._vlans()
+        host_bonds = self._host_bonds()
 
         host_vlans = collections.defaultdict(list)
         for host, bonds in host_bonds.items():
             _vids = set([])
             for bond in bonds['bonds']:
-                for vid in filter.uncluster(bond['vids']):
+                for vid in filter.uncluster(bond.vids):
                     _vids.add(vid)
 
-                for id, v in master_vlans.items():
-                    if v['tenant'] == bond['tenant'] and v['type'] == 'l3':
-                        _vids.add(id)
+                if bond.tenant in vlans.l3vni:
+                    _vids.add(vlans.l3vni[bond.tenant]['id'])
 
-            for _vid in _vids:
-                host_vlans[host].append(master_vlans[_vid])
+            for _vid in sorted(_vids, key=int):
+                host_vlans[host].append(vlans.by_id[_vid])
 
-        for host in inventory.hosts('border'):
-            for id, v in master_vlans.items():
-                if v['type'] == 'l3':
-                    host_vlans[host].append(v)
+        for host in self.inventory.hosts('border'):
+            host_vlans[host].extend(vlans.l3vni.values())
 
         return host_vlans
 
-    def vxlans(self):
+    @cached
+    def _vxlans(self):
         '''
-        Build a vxlan variable. Data is derive from self._host_vlans.
+        Build a vxlan records of each host. Data is derive from
+        self._host_vlans.
         '''
         base_name = 'vni'
         base_vxlan_id = 0
         host_vlans = self._host_vlans
+        loopback_ips = self.loopback_ips()
 
         vxlans = {}
         for host, vlans in host_vlans.items():
-            lo = self.loopback_ips()[host]['ip_addresses'][0].split('/')[0]
+            lo = loopback_ips[host]['ip_addresses'][0].split('/')[0]
             vxlan_interfaces = []
             for vlan in vlans:
                 alias = '{}.{}.{}'.format(
@@ -320,13 +368,12 @@ class ConfigVars:
                     )
                 name = base_name + vlan['id']
                 vxlan_id = str(base_vxlan_id + int(vlan['id']))
-                vxlan_interfaces.append({
-                    'alias': alias, 'name': name, 'vlan': vlan['vlan'],
-                    'tenant': vlan['tenant'], 'type': vlan['type'],
-                    'id': vxlan_id, 'vid': vlan['id']
-                    })
+                vxlan_interfaces.append(VxlanInterface(
+                    alias, name, vlan['vlan'], vlan['tenant'], vlan['type'],
+                    vxlan_id, vlan['id']
+                ))
             summary = filter.cluster(
-                [i['name'] for i in vxlan_interfaces], group_name=True
+                [i.name for i in vxlan_interfaces], group_name=True
                 )
             vxlans[host] = {
                 'local_tunnelip': lo, 'vxlan_interfaces': vxlan_interfaces,
@@ -335,15 +382,21 @@ class ConfigVars:
 
         return vxlans
 
+    def vxlans(self):
+        '''
+        Build a vxlan variable. Data is derive from self._vxlans.
+        '''
+        return as_dict(self._vxlans())
+
     def l3vni(self):
-        vxlans = self.vxlans()
+        vxlans = self._vxlans()
 
         l3vni = {}
         for host, v in vxlans.items():
             _l3vni = {}
             for vxlan in v['vxlan_interfaces']:
-                if vxlan['type'] == 'l3':
-                    _l3vni[vxlan['tenant']] = vxlan['id']
+                if vxlan.type == 'l3':
+                    _l3vni[vxlan.tenant] = vxlan.id
             l3vni[host] = _l3vni
         return l3vni
 
@@ -354,9 +407,9 @@ class ConfigVars:
         the network_prefix or prefixlen attribute. Data is save on
         vlas_network.json file.
         '''
-        mv = self._vlans()
-        vlans_network = File('vlans_network')
-        vlans = self._vlans(key='vlan')
+        mv = self._vlans().master
+        vlans_network = self.project.state('vlans_network')
+        vlans = self._vlans().by_vlan
 
         for vlan, v in vlans_network.data.copy().items():
             # Delete VLANs IP network not in master file
@@ -367,8 +420,10 @@ class ConfigVars:
             map(lambda x: x['network_prefix'], vlans_network.data.values())
         )
 
-        checkvars = CheckVars()
-        base_vlans_network = Network(checkvars.base_networks['vlans'])
+        checkvars = self.checkvars
+        allocate = self._vlans_allocator(
+            Network(checkvars.base_networks['vlans']), existing_net_prefix
+        )
         for vlan, v in vlans.items():
             if v['type'] == 'l2':
                 if 'network_prefix' in v:
@@ -378,6 +433,11 @@ class ConfigVars:
                         checkvars.vlans_network(
                             t, mv[t][v['index']], vlans_network.data
                         )
+                        vlans_network.data[vlan] = {
+                            'allocation': allocation,
+                            'network_prefix': v['network_prefix']
+                        }
+                        existing_net_prefix.append(v['network_prefix'])
                     else:
                         if (vlans_network.data[vlan]['network_prefix']
                                 != v['network_prefix']):
@@ -392,9 +452,7 @@ class ConfigVars:
                 elif 'prefixlen' in v:
                     allocation = 'auto_prefixlen'
                     if vlan not in vlans_network.data:
-                        subnet = base_vlans_network.get_subnet(
-                            existing_net_prefix, prefixlen=v['prefixlen']
-                        )
+                        subnet = allocate(v['tenant'], v['prefixlen'])
                         vlans_network.data[vlan] = {
                             'allocation': allocation,
                             'network_prefix': subnet
@@ -403,9 +461,8 @@ class ConfigVars:
                     else:
                         if (vlans_network.data[vlan]['allocation']
                                 != 'auto_prefixlen'):
-                            subnet = base_vlans_network.get_subnet(
-                                existing_net_prefix,
-                                prefixlen=v['prefixlen']
+                            subnet = allocate(
+                                v['tenant'], v['prefixlen']
                             )
                             vlans_network.data[vlan].update({
                                 'network_prefix': subnet,
@@ -414,9 +471,7 @@ class ConfigVars:
                 else:
                     allocation = 'auto_network_prefix'
                     if vlan not in vlans_network.data:
-                        subnet = base_vlans_network.get_subnet(
-                            existing_net_prefix
-                        )
+                        subnet = allocate(v['tenant'])
                         vlans_network.data[vlan] = {
                             'allocation': allocation,
                             'network_prefix': subnet
@@ -424,9 +479,7 @@ class ConfigVars:
                     else:
                         if (vlans_network.data[vlan]['allocation']
                                 != 'auto_network_prefix'):
-                            subnet = base_vlans_network.get_subnet(
-                                existing_net_prefix
-                            )
+                            subnet = allocate(v['tenant'])
                             vlans_network.data[vlan].update({
                                 'network_prefix': subnet,
                                 'allocation': 'auto_network_prefix'
@@ -434,61 +487,154 @@ class ConfigVars:
 
         return vlans_network.dump()
 
-    def vlans_interface(self, gw=False):
+    def _vlans_allocator(self, base_network, existing_networks):
         '''
-        Build an SVI variable. Data is derived from self._vlans_network.
+        Return the function that allocates the network prefix of a VLAN,
+        allocate(tenant, prefixlen=24). The allocated prefixes are appended
+        to 'existing_networks'.
+
+        By default the prefixes are allocated in order from the 'vlans'
+        base network. In 'tenant_blocks' mode, each tenant has blocks of the
+        base network (saved on tenant_blocks.json file) and its prefixes
+        are allocated in its blocks, so that they summarize into few
+        aggregates (see bgp_aggregates).
+
+        Optional variable in master.yml
+        -------------------------------
+        vlans_allocation:
+          mode: tenant_blocks  # default is sequential
+          prefixlen: 20  # size of the tenant blocks, default is 20
+        '''
+        metrics = self.project.metrics
+        allocation = self.mf.get('vlans_allocation') or {}
+        mode = allocation.get('mode', 'sequential')
+
+        def carve(network, occupied, prefixlen):
+            subnet = network.get_subnet(occupied, prefixlen=prefixlen)
+            if occupied is not existing_networks:
+                existing_networks.append(subnet)
+            metrics.inc('allocations', pool='vlans_network')
+            return subnet
+
+        def sequential(tenant, prefixlen=24):
+            return carve(base_network, existing_networks, prefixlen)
+
+        if mode == 'sequential':
+            return sequential
+        elif mode != 'tenant_blocks':
+            raise AnsibleError(
+                "Invalid vlans_allocation mode: '{}' "
+                "(valid options: sequential, tenant_blocks)".format(mode)
+            )
+
+        block_prefixlen = int(allocation.get('prefixlen', 20))
+        tenant_blocks = self.project.state('tenant_blocks')
+        for tenant in list(tenant_blocks.data):
+            if tenant not in self._vlans().master:
+                del tenant_blocks.data[tenant]
+        tenant_blocks.dump()
+
+        def occupied():
+            return existing_networks + [
+                block for blocks in tenant_blocks.data.values()
+                for block in blocks
+            ]
+
+        def allocate(tenant, prefixlen=24):
+            # A VLAN larger than a block is allocated outside the blocks
+            if prefixlen < block_prefixlen:
+                return carve(base_network, occupied(), prefixlen)
+
+            for block in tenant_blocks.data.get(tenant, []):
+                try:
+                    return carve(Network(block), existing_networks, prefixlen)
+                except AnsibleError:
+                    continue
+
+            block = base_network.get_subnet(
+                occupied(), prefixlen=block_prefixlen
+            )
+            tenant_blocks.data.setdefault(tenant, []).append(block)
+            tenant_blocks.dump()
+            metrics.inc('allocations', pool='tenant_blocks')
+
+            return carve(Network(block), existing_networks, prefixlen)
+
+        return allocate
+
+    @cached
+    def _address_plan(self):
+        '''
+        Build the SVI address plan of all the hosts and VLANs in one pass.
+        Data is derived from self._vlans_network and self._host_vlans.
         '''
         vlans_network = self._vlans_network
+        vlans = [
+            (vlan, v['id'], vlans_network[vlan]['network_prefix'])
+            for vlan, v in self._vlans().by_vlan.items() if v['type'] == 'l2'
+        ]
+        host_ids = [Host(host).id for host in self._host_vlans]
+
+        return AddressPlan(vlans, host_ids)
+
+    @cached
+    def _vlans_interface(self):
+        '''
+        Build an SVI records of each host and the VLANs gateway.
+        Data is derived from self._address_plan.
+        '''
+        plan = self._address_plan()
         host_vlans = self._host_vlans
 
         _gw = {}
         vlans_interface = {}
         for host, vlans in host_vlans.items():
-            svi = {'l2svi': [], 'l3svi': [], 'vids': []}
-            _host = Host(host)
-
             for vlan in vlans:
                 if vlan['type'] == 'l2':
-                    network = Network(
-                        vlans_network[vlan['vlan']]['network_prefix']
-                        )
-                    vhwaddr = (
-                        MACAddr('44:38:39:FF:01:00') + int(vlan['id'])
-                    )
-                    vip = network.get_ip(0)
                     _gw[vlan['name']] = {
-                        'gw': vip, 'net_prefix': str(network)
+                        'gw': plan.vip(vlan['vlan']),
+                        'net_prefix': plan.network(vlan['vlan'])
                     }
-                    ip = network.get_ip(-_host.id)
-                    svi['l2svi'].append({
-                        'name': vlan['name'], 'ip': ip, 'vip': vip,
-                        'vhwaddr': vhwaddr, 'vrf': vlan['tenant'],
-                        'vlan': vlan['vlan'], 'vid': vlan['id']
-                        })
-                    svi['vids'].append(vlan['id'])
-                else:
-                    if host in inventory.hosts('leaf'):
-                        router_mac = (
-                            MACAddr('44:39:39:FF:FF:FF') - _host.rack_id
-                        )
-                        svi['l3svi'].append({
-                            'router_mac': router_mac, 'vrf': vlan['tenant'],
-                            'vlan': vlan['vlan'], 'vid': vlan['id'],
-                            'vni': vlan['id']
-                            })
-                        svi['vids'].append(vlan['id'])
-                    else:
-                        svi['l3svi'].append({
-                            'vrf': vlan['tenant'], 'vlan': vlan['vlan'],
-                            'vid': vlan['id'], 'vni': vlan['id']
-                            })
-                        svi['vids'].append(vlan['id'])
 
-            vlans_interface[host] = svi
+            vlans_interface[host] = self._host_svi(host, vlans, plan)
+
+        return vlans_interface, _gw
+
+    def _host_svi(self, host, vlans, plan):
+        ''' Build the SVI records of a host given its VLANs '''
+        svi = {'l2svi': [], 'l3svi': [], 'vids': []}
+        _host = Host(host)
+
+        router_mac = None
+        if self.inventory.in_group(host, 'leaf'):
+            router_mac = MACAddr('44:39:39:FF:FF:FF') - _host.rack_id
+
+        for vlan in vlans:
+            if vlan['type'] == 'l2':
+                svi['l2svi'].append(L2Svi(
+                    vlan['name'], plan.svi_ip(_host.id, vlan['vlan']),
+                    plan.vip(vlan['vlan']), plan.vhwaddr(vlan['vlan']),
+                    vlan['tenant'], vlan['vlan'], vlan['id']
+                ))
+                svi['vids'].append(vlan['id'])
+            else:
+                svi['l3svi'].append(L3Svi(
+                    router_mac, vlan['tenant'], vlan['vlan'],
+                    vlan['id'], vlan['id']
+                ))
+                svi['vids'].append(vlan['id'])
+
+        return svi
+
+    def vlans_interface(self, gw=False):
+        '''
+        Build an SVI variable. Data is derived from self._vlans_interface.
+        '''
+        vlans_interface, _gw = self._vlans_interface()
 
         if gw:
-            return _gw
-        return vlans_interface
+            return as_dict(_gw)
+        return as_dict(vlans_interface)
 
     def _ip_network_link_nodes(self, with_base_network=True):
         '''
@@ -501,24 +647,28 @@ class ConfigVars:
             links:
               - 'edge:eth0 -- border:swp1'
             interface_type: sub_interface
+            prefixlen: 31  # optional, default is 30
 
         base_networks:
           external_connectivity: '192.168.254.0/23'
         '''
         ip_network_type = ['ip', 'sub_interface']
-        l3vni = {
-            v['tenant']: v['id']
-            for k, v in self._vlans(key='vlan').items()
-            if v['type'] == 'l3'
-        }
+        l3vni = {k: v['id'] for k, v in self._vlans().l3vni.items()}
 
         _ip_network_links = {}
-        for k, v in mf['network_links'].items():
+        for k, v in self.mf['network_links'].items():
             if v['interface_type'] in ip_network_type:
-                links = Link(k, v['links'])
-                base_network = CheckVars().link_base_network(k)
+                links = Link(k, v['links'], self.inventory)
+                base_network = self.checkvars.link_base_network(k)
                 link_nodes = links.link_nodes()
 
+                prefixlen = v['prefixlen'] if 'prefixlen' in v else 30
+                if prefixlen not in [30, 31]:
+                    raise AnsibleError(
+                        "Invalid prefixlen for network link '{}': {} "
+                        "(valid options: 30, 31)".format(k, prefixlen)
+                    )
+
                 _links = {}
                 for link in links:
                     nodes = [node for node in link_nodes[link]]
@@ -527,15 +677,23 @@ class ConfigVars:
                             for item in v['vifs']:
                                 vrf = item['vrf'] if 'vrf' in item else None
                                 _link = '{}_{}'.format(link, item['vid'])
-                                _links[_link] = {'vrf': vrf, 'nodes': nodes}
+                                _links[_link] = {
+                                    'vrf': vrf, 'nodes': nodes,
+                                    'prefixlen': prefixlen
+                                }
                         except KeyError:
                             for vrf, vid in l3vni.items():
                                 _link = '{}_{}'.format(link, vid)
-                                _links[_link] = {'vrf': vrf, 'nodes': nodes}
+                                _links[_link] = {
+                                    'vrf': vrf, 'nodes': nodes,
+                                    'prefixlen': prefixlen
+                                }
 
                     elif v['interface_type'] == 'ip':
                         vrf = v['vrf'] if 'vrf' in v else None
-                        _links[link] = {'vrf': vrf, 'nodes': nodes}
+                        _links[link] = {
+                            'vrf': vrf, 'nodes': nodes, 'prefixlen': prefixlen
+                        }
 
                 if with_base_network:
                     _ip_network_links[base_network] = _links
@@ -548,34 +706,50 @@ class ConfigVars:
     @property
     def _ip_network_links(self):
         '''
-        Generate a unique IP network /30 for point-to-point link that
-        require a IP network and save it in 'ip_network_links.json' file.
-        Data is derive from self._ip_network_link_nodes.
+        Generate a unique IP network /30 (or /31) for point-to-point link
+        that require a IP network and save it in 'ip_network_links.json'
+        file. The new links of a base network are carved in bulk and the
+        existing assignments are kept. Data is derive from
+        self._ip_network_link_nodes.
         '''
-        ip_network_links = File('ip_network_links')
+        ip_network_links = self.project.state('ip_network_links')
         link_network = ip_network_links.data
         ip_network_link_nodes = self._ip_network_link_nodes()
 
-        nodes_link = [i for k, v in ip_network_link_nodes.items() for i in v]
-        for link in link_network.copy():
-            if link not in nodes_link:
+        nodes_link = {
+            link: v['prefixlen']
+            for _, links in ip_network_link_nodes.items()
+            for link, v in links.items()
+        }
+        for link, subnet in link_network.copy().items():
+            if (link not in nodes_link
+                    or int(subnet.split('/')[1]) != nodes_link[link]):
                 del link_network[link]
 
         existing_networks = list(link_network.values())
         for network, link_nodes in ip_network_link_nodes.items():
-            net = Network(network)
-            for link, nodes in link_nodes.items():
+            new_links = collections.defaultdict(list)
+            for link, v in link_nodes.items():
                 if link not in link_network:
-                    subnet = net.get_subnet(existing_networks, prefixlen=30)
-                    link_network[link] = subnet
+                    new_links[v['prefixlen']].append(link)
+
+            net = Network(network)
+            for prefixlen, links in new_links.items():
+                subnets = net.get_subnets(
+                    existing_networks, len(links), prefixlen=prefixlen
+                )
+                link_network.update(zip(links, subnets))
+                self.project.metrics.inc(
+                    'allocations', len(subnets), pool='ip_network_links'
+                )
 
         return ip_network_links.dump()
 
-    def ip_interfaces(self):
+    @cached
+    def _ip_interfaces(self):
         '''
-        Build an IP interfaces variable. Data is derive from
+        Build an IP interfaces records of each host. Data is derive from
         self._ip_network_link and self._ip_network_link_nodes
-
         '''
         ip_network_links = self._ip_network_links
         ip_network_link_nodes = (
@@ -585,32 +759,28 @@ class ConfigVars:
         ip_interfaces = collections.defaultdict(dict)
         for link, v in ip_network_link_nodes.items():
             net = Network(ip_network_links[link])
-            for idx, node in enumerate(v['nodes'], start=1):
+            ips, addrs = net.endpoints(), net.endpoints(addr=True)
+            for idx, node in enumerate(v['nodes']):
                 try:
                     vid = link.split('_')[1]
-                    interface = '{}.{}'.format(node['interface'], vid)
+                    interface = '{}.{}'.format(node.interface, vid)
                 except IndexError:
-                    interface = node['interface']
-
-                ip = net.get_ip(idx)
-                nip = net.get_ip(idx-1, addr=True)
-                ip_interfaces[node['host']][interface] = {
-                    'ip': ip, 'alias': link, 'vrf': v['vrf'],
-                    'neighbor': {
-                        'host': node['neighbor'], 'address': nip,
-                        'interface': node['ninterface'],
-                        'group': node['ngroup']
-                    }
-                }
+                    interface = node.interface
+
+                ip, nip = ips[idx], addrs[idx - 1]
+                ip_interfaces[node.host][interface] = IpInterface(
+                    ip, link, v['vrf'], Neighbor(
+                        node.neighbor, nip, node.ninterface, node.ngroup
+                    )
+                )
 
-        master_ip_interfaces = mf['ip_interfaces']
+        master_ip_interfaces = self.mf['ip_interfaces']
         for host, interfaces in master_ip_interfaces.items():
-            if host in inventory.hosts():
+            if self.inventory.in_group(host):
                 for item in interfaces:
-                    ip_interfaces[host][item['name']] = {
-                        'ip': item['ip_address'], 'alias': item['alias'],
-                        'vrf': 'default', 'neighbor': None
-                    }
+                    ip_interfaces[host][item['name']] = IpInterface(
+                        item['ip_address'], item['alias'], 'default', None
+                    )
             else:
                 raise AnsibleError(
                     "%s not found in inventory file, "
@@ -624,9 +794,17 @@ class ConfigVars:
 
         return interface_sort
 
-    def unnumbered_interfaces(self):
+    def ip_interfaces(self):
+        '''
+        Build an IP interfaces variable. Data is derive from
+        self._ip_interfaces
         '''
-        Build a unnumbered interfaces.
+        return as_dict(self._ip_interfaces())
+
+    @cached
+    def _unnumbered_interfaces(self):
+        '''
+        Build a unnumbered interfaces records of each host.
 
         Required variable in master.yml
         -------------------------------
@@ -638,23 +816,21 @@ class ConfigVars:
             interface_type: unnumbered
         '''
         unnumbered_interfaces = collections.defaultdict(dict)
-        for k, v in mf['network_links'].items():
+        for k, v in self.mf['network_links'].items():
             if v['interface_type'] == 'unnumbered':
-                links = Link(k, v['links'])
+                links = Link(k, v['links'], self.inventory)
                 link_nodes = links.link_nodes()
                 vrf = v['vrf'] if 'vrf' in v else 'default'
 
                 for link, nodes in link_nodes.items():
                     for node in nodes:
-                        host, interface = node['host'], node['interface']
-                        unnumbered_interfaces[host][interface] = {
-                            'alias': link, 'vrf': vrf,
-                            'neighbor': {
-                                'host': node['neighbor'],
-                                'interface': node['ninterface'],
-                                'group': node['ngroup']
-                            }
-                        }
+                        host, interface = node.host, node.interface
+                        unnumbered_interfaces[host][interface] = (
+                            UnnumberedInterface(link, vrf, Neighbor(
+                                node.neighbor, None, node.ninterface,
+                                node.ngroup
+                            ))
+                        )
 
         interface_sort = {
             k: collections.OrderedDict(
@@ -664,68 +840,93 @@ class ConfigVars:
 
         return interface_sort
 
-    def bgp_neighbors(self):
+    def unnumbered_interfaces(self):
         '''
-        Generate a BGP neighbors variable.
-        Data is derive from self.ip_interfaces and self.unnumbered_interfaces
+        Build a unnumbered interfaces variable. Data is derive from
+        self._unnumbered_interfaces
         '''
-        bgp_config = {}
-        base_asn = CheckVars().base_asn
+        return as_dict(self._unnumbered_interfaces())
+
+    @cached
+    def _fabric_adjacency(self):
+        '''
+        Build the BGP sessions index of the fabric once.
+        Data is derive from self.loopback_ips, self._ip_interfaces and
+        self._unnumbered_interfaces
+        '''
+        loopback_ips = self.loopback_ips()
+
+        routers = {}
+        base_asn = self.checkvars.base_asn
         for group, asn in base_asn.items():
-            for host in inventory.hosts(group):
+            for host in self.inventory.hosts(group):
                 _host = Host(host)
-                lo = self.loopback_ips()[host]['ip_addresses'][0]
+                lo = loopback_ips[host]['ip_addresses'][0]
                 router_id = lo.split('/')[0]
                 _asn = asn if group == 'spine' else asn + _host.id
-                bgp_config[host] = {'as': _asn, 'router_id': router_id}
-
-        ifaces = [self.ip_interfaces(), self.unnumbered_interfaces()]
-        _ifaces = collections.defaultdict(dict)
-        for item in ifaces:
-            for k, v in item.items():
-                _ifaces[k].update(v)
-
-        bgp_neighbors = collections.defaultdict(dict)
-        for host, ifaces in _ifaces.items():
-            neighbors, vrf, peer_groups = (
-                collections.defaultdict(list), {}, set([])
-            )
-            for iface, v in ifaces.items():
-                if v['neighbor'] is not None:
-                    n = v['neighbor']
-                    remote_id = bgp_config[n['host']]['router_id']
-                    if 'ip' not in v:
-                        remote_as = 'external'
-                        nei = iface
-                    else:
-                        remote_as = bgp_config[n['host']]['as']
-                        nei = n['address']
+                routers[host] = {'as': _asn, 'router_id': router_id}
 
-                    vrf[v['vrf']] = {
-                        'router_id': bgp_config[host]['router_id'],
-                        'as': bgp_config[host]['as']
-                    }
-                    neighbors[v['vrf']].append({
-                        'neighbor': nei, 'remote_as': remote_as,
-                        'remote_id': remote_id, 'peer_group': n['group'],
-                        'remote_host': n['host'],
-                        'remote_interface': n['interface'],
-                        'local_interface': iface
-                    })
+        return FabricAdjacency(
+            routers, [self._ip_interfaces(), self._unnumbered_interfaces()]
+        )
 
-            for _vrf, v in neighbors.items():
-                peer_groups = [
-                    k for k, v in itertools.groupby(
-                        v, lambda x: x['peer_group'])
-                ]
-                vrf[_vrf].update({
-                    'neighbors': neighbors[_vrf],
-                    'peer_groups': peer_groups
-                    })
+    def bgp_neighbors(self):
+        '''
+        Generate a BGP neighbors variable.
+        Data is derive from self._fabric_adjacency
+        '''
+        adjacency = self._fabric_adjacency()
+
+        bgp_neighbors = {}
+        for host in adjacency:
+            bgp_neighbors[host] = adjacency.vrfs(host)
+
+        return bgp_neighbors
+
+    def bgp_aggregates(self):
+        '''
+        Build the aggregates of the VLANs network prefixes to advertise in
+        BGP, per tenant (VRF). A leaf advertises the aggregates of the
+        VLANs of its rack and a border the aggregates of all the VLANs of
+        each tenant. Data is derived from self._vlans_network and
+        self._host_vlans.
+
+        Return values:
+        {
+            "leaf01": {"tenant01": ["10.1.0.0/23"]},
+            "border01": {
+                "tenant01": ["10.1.0.0/23", "10.1.4.0/24"],
+                "tenant02": ["10.1.2.0/23"]
+            }
+        }
+        '''
+        vlans_network = self._vlans_network
 
-            bgp_neighbors[host] = vrf
+        def aggregates(vlans):
+            prefixes = collections.defaultdict(list)
+            for vlan in vlans:
+                if vlan['type'] == 'l2':
+                    prefixes[vlan['tenant']].append(
+                        vlans_network[vlan['vlan']]['network_prefix']
+                    )
+
+            return {
+                tenant: Network.summarize(v)
+                for tenant, v in sorted(prefixes.items())
+            }
+
+        tenants = aggregates(self._vlans().by_vlan.values())
+
+        bgp_aggregates = {}
+        for host, vlans in self._host_vlans.items():
+            if self.inventory.in_group(host, 'border'):
+                bgp_aggregates[host] = {
+                    tenant: list(v) for tenant, v in tenants.items()
+                }
+            else:
+                bgp_aggregates[host] = aggregates(vlans)
 
-        return dict(bgp_neighbors)
+        return bgp_aggregates
 
     @property
     def _nat_rules(self):
@@ -744,11 +945,11 @@ class ConfigVars:
         base_networks:
           oob_management: '172.24.0.0/24'
         '''
-        nat_rules = File('nat_rules')
+        nat_rules = self.project.state('nat_rules')
         available_rules = iter([
-            r for r in range(500, 600, 10) if str(r) not in nat_rules.data
+            r for r in NAT_RULE_IDS if str(r) not in nat_rules.data
         ])
-        vlans = self._vlans(key='vlan')
+        vlans = self._vlans().by_vlan
         vlans_network = self._vlans_network
         nat_networks = {k: v for k, v in vlans.items() if 'allow_nat' in v}
         network_prefixes = [
@@ -760,7 +961,7 @@ class ConfigVars:
         ]
 
         # Add nat rule for oob-management network
-        oob_mgmt_network = CheckVars().base_networks['oob_management']
+        oob_mgmt_network = self.checkvars.base_networks['oob_management']
         nat_rules.data['1'] = {
             'name': 'oob_management',
             'tenant': 'default', 'source_address': oob_mgmt_network
@@ -779,6 +980,7 @@ class ConfigVars:
                     'tenant': vlans[k]['tenant'],
                     'source_address': source_address
                 }
+                self.project.metrics.inc('allocations', pool='nat')
 
         for k, v in nat_rules.data.items():
             for k1, v1 in vlans_network.items():
@@ -804,7 +1006,7 @@ class ConfigVars:
                 eth2:
                     address: '172.24.0.254/24'
         '''
-        master_ip_interfaces = mf['ip_interfaces']
+        master_ip_interfaces = self.mf['ip_interfaces']
         nat_rules = self._nat_rules
 
         nat_host = collections.defaultdict(list)
@@ -826,9 +1028,9 @@ class ConfigVars:
 
     @property
     def _server_interfaces(self):
-        host_ifaces = mf['server_interfaces']
-        mgmt_gw = mf['gateway_address']
-        server_bonds = CheckVars().server_bonds()
+        host_ifaces = self.mf['server_interfaces']
+        mgmt_gw = self.mf['gateway_address']
+        server_bonds = self.checkvars.server_bonds()
         interfaces = {}
         for host in server_bonds:
             mgmt_port = host_ifaces[host]['mgmt_port']
@@ -858,18 +1060,18 @@ class ConfigVars:
 
     def server_interfaces(self):
         server_interfaces = self._server_interfaces
-        vlans = self._vlans(key='vlan')
-        vlans_gw = self.vlans_interface(gw=True)
+        vlans = self._vlans().by_vlan
+        plan = self._address_plan()
 
         for host, v in server_interfaces.items():
             for idx, _vlan in enumerate(v['vlans']):
                 vlan = _vlan['vlan']
                 primary_gw = False
-                net = Network(vlans_gw[vlan]['net_prefix'])
-                ip = net.get_ip(9 + Host(host).id)
+                net = plan.network(vlan)
+                ip = plan.get_ip(vlan, 9 + Host(host).id)
                 tenant = vlans[vlan]['tenant']
                 name = vlans[vlan]['name']
-                gateway = vlans_gw[vlan]['gw'].split('/')[0]
+                gateway = plan.get_ip(vlan, 0, addr=True)
                 if 'allow_nat' in vlans[vlan]:
                     primary_gw = True
                 # routes.append(str(net))
@@ -881,19 +1083,19 @@ class ConfigVars:
 
                 _vlan.update({
                     'ip': ip, 'gateway': gateway,
-                    'network_prefix': str(net), 'primary_gw': primary_gw,
+                    'network_prefix': net, 'primary_gw': primary_gw,
                     'tenant': tenant, 'name': name,
                     # 'routes': _routes
                 })
 
-        for host in inventory.hosts('server'):
+        for host in self.inventory.hosts('server'):
             if host not in server_interfaces:
                 print(
                     "\033[1;35mINFO: %s is not defined in server_interfaces, "
-                    "check your master.yml" % host
+                    "check your master.yml" % host, file=sys.stderr
                 )
         return server_interfaces
 
     def check_interfaces(self):
-        CheckVars().interfaces
+        self.checkvars.interfaces
         return 'All good'
@@ -0,0 +1,115 @@
+'''
+Export of the configuration variables as Ansible host_vars, one JSON file
+per host. A host file is only rewritten when its content changes, and
+'.export_index.json' records the exported files and what changed.
+'''
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+
+INDEX_FILE = '.export_index.json'
+
+
+def host_variables(project=None, names=None):
+    '''
+    Compute the configuration variables of a project and regroup them per
+    host: {'leaf01': {'loopback_ips': {...}, 'mlag_bonds': {...}}, ...}
+    '''
+    from cumulus_vxconfig.configvars import ConfigVars, variable_names
+
+    _configvars = ConfigVars(project)
+    metrics = _configvars.project.metrics
+    names = names or variable_names()
+
+    hosts = collections.OrderedDict()
+    for name in names:
+        with metrics.timer('variable_duration_seconds', variable=name):
+            result = getattr(_configvars, name)()
+        if not isinstance(result, dict):
+            continue
+
+        for host, value in result.items():
+            hosts.setdefault(host, collections.OrderedDict())[name] = value
+
+    return hosts
+
+
+def write_if_changed(path, content):
+    '''
+    Atomically write 'content' (bytes) to 'path' unless the file already
+    has the same content. Return the content hash and if it was written.
+    '''
+    digest = hashlib.sha256(content).hexdigest()
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return digest, False
+    except FileNotFoundError:
+        pass
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+    return digest, True
+
+
+def _load_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {'hosts': {}}
+
+
+def export_host_vars(directory, workers=None, hosts=None, project=None):
+    '''
+    Write the variables of each host to '<directory>/<host>.json' and
+    return the export index:
+    {
+        "hosts": {"leaf01": {"file": "leaf01.json", "sha256": "..."}},
+        "changed": ["leaf01"], "unchanged": [...], "removed": [...]
+    }
+    Only the files are written in parallel, by a pool of 'workers'
+    threads, the variables are computed serially by 'host_variables'.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    previous = _load_index(directory)
+    if hosts is None:
+        hosts = host_variables(project)
+
+    def export(item):
+        host, variables = item
+        fname = host + '.json'
+        content = json.dumps(variables, indent=4).encode() + b'\n'
+        digest, written = write_if_changed(
+            os.path.join(directory, fname), content
+        )
+        return host, fname, digest, written
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(export, hosts.items()))
+
+    index = {'hosts': {}, 'changed': [], 'unchanged': [], 'removed': []}
+    for host, fname, digest, written in results:
+        index['hosts'][host] = {'file': fname, 'sha256': digest}
+        index['changed' if written else 'unchanged'].append(host)
+
+    # Remove the files of the hosts that are no longer exported
+    for host, v in sorted(previous['hosts'].items()):
+        if host not in index['hosts']:
+            try:
+                os.remove(os.path.join(directory, v['file']))
+            except FileNotFoundError:
+                pass
+            index['removed'].append(host)
+
+    write_if_changed(
+        os.path.join(directory, INDEX_FILE),
+        json.dumps(index, indent=4, sort_keys=True).encode() + b'\n'
+    )
+
+    return index
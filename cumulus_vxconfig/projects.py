@@ -0,0 +1,106 @@
+'''
+Batch processing of many fabrics (projects) in one invocation. Each
+project is a directory with its own master.yml and devices, processed in
+a worker of a process pool with the state directory of the project, the
+same as when it is run alone (see 'project_state_dir').
+'''
+import glob
+import multiprocessing
+import os
+import traceback
+
+from cumulus_vxconfig.utils.project import Project
+
+
+def expand_projects(patterns):
+    '''
+    Expand the project directories and glob patterns, keep the
+    directories with a master.yml.
+    '''
+    projects = []
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [
+            pattern
+        ]
+        for path in paths:
+            path = os.path.abspath(path)
+            if (os.path.isfile(os.path.join(path, 'master.yml'))
+                    and path not in projects):
+                projects.append(path)
+
+    return projects
+
+
+def open_project(path):
+    ''' Return the Project of a directory, with its own state directory '''
+    return Project(path)
+
+
+def _run(args):
+    path, task, options = args
+    project = open_project(path)
+    try:
+        result = task(project, **options)
+        return path, {'ok': True, 'result': result}
+    except Exception as err:
+        return path, {
+            'ok': False, 'error': str(err) or traceback.format_exc()
+        }
+    finally:
+        # The pool workers exit without running the atexit hooks
+        project.flush()
+
+
+def run_projects(projects, task, processes=None, **options):
+    '''
+    Run 'task(project, **options)' for each project and return the results
+    in project order: [(path, {"ok": true, "result": ...}), ...]
+
+    'task' must be a module-level function (it is pickled to the workers).
+    '''
+    if not projects:
+        return []
+
+    # Workers inherit the modules already imported by this process
+    from cumulus_vxconfig import configvars  # noqa: F401
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    processes = min(processes or os.cpu_count() or 1, len(projects))
+    with context.Pool(processes) as pool:
+        return pool.map(
+            _run, [(path, task, options) for path in projects], chunksize=1
+        )
+
+
+def config_variable(project, name, host=None):
+    from cumulus_vxconfig.configvars import ConfigVars
+
+    result = getattr(ConfigVars(project), name)()
+    if host is not None:
+        result = result[host]
+    return result
+
+
+def check(project, max_errors=None):
+    from cumulus_vxconfig.utils.checkvars import CheckVars, format_errors
+
+    errors = CheckVars(project, collect=True).check_all()
+    return format_errors(errors, max_errors) if errors else None
+
+
+def export(project, directory):
+    from cumulus_vxconfig.export import export_host_vars
+
+    return export_host_vars(
+        os.path.join(project.path, directory), project=project
+    )
+
+
+def capacity(project):
+    from cumulus_vxconfig.capacity import capacity
+
+    return capacity(project)
@@ -0,0 +1,217 @@
+'''
+Warm daemon that keeps master.yml, the inventory and the computed
+configuration variables of one or more projects in memory and serves them
+over a Unix socket. Each connection is handled in its own thread and each
+project has its own lock, so projects are served concurrently.
+
+Protocol, one request per line, one JSON response per line:
+    [@project] get <variable> [host]
+        {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+    list
+        {"ok": true, "result": ["bgp_neighbors", ...]}
+    projects
+        {"ok": true, "result": ["fabric01", ...]}
+
+'@project' selects a project by name, it can be left out when a single
+project is served.
+'''
+import collections
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import traceback
+
+from ansible.errors import AnsibleError
+from cumulus_vxconfig import configvars
+from cumulus_vxconfig.utils.project import Project
+
+
+def default_socket():
+    return os.path.join(os.getcwd(), '.cumulus_getconfig.sock')
+
+
+def remove_stale_socket(path):
+    '''
+    Remove the socket of a server that is gone. Anything else at 'path'
+    (a file, a socket a server still listens on) is left as it is and
+    raise an AnsibleError.
+    '''
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(st.st_mode):
+        raise AnsibleError('{} exists and is not a socket'.format(path))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path)
+            return
+
+    raise AnsibleError('a server is already listening on {}'.format(path))
+
+
+class ConfigServer:
+
+    def __init__(self, project=None, interval=1.0):
+        self.project = project if project is not None else Project.default()
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.names = configvars.variable_names()
+        self.signature = None
+        self.results = {}
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Reload the project and recompute every variable if master.yml or
+        the inventory changed since the last refresh.
+        '''
+        with self.lock:
+            signature = self.project.signature()
+            if signature == self.signature:
+                return False
+
+            self.results = {}
+            try:
+                if self.signature is not None:
+                    self.project.reset()
+                _configvars = configvars.ConfigVars(self.project)
+            except Exception as err:
+                for name in self.names:
+                    self.results[name] = {'ok': False, 'error': str(err)}
+                return True
+            finally:
+                self.signature = signature
+
+            for name in self.names:
+                try:
+                    result = getattr(_configvars, name)()
+                    self.results[name] = {'ok': True, 'result': result}
+                except Exception as err:
+                    self.results[name] = {'ok': False, 'error': str(err)}
+
+            self.project.flush()
+            return True
+
+    def get(self, name, host=None):
+        with self.lock:
+            self.refresh()
+
+            if name not in self.results:
+                return {
+                    'ok': False,
+                    'error': 'configuration variable not found: ' + name
+                }
+
+            response = self.results[name]
+            if host is None or not response['ok']:
+                return response
+
+            result = response['result']
+            if not isinstance(result, dict) or host not in result:
+                return {
+                    'ok': False,
+                    'error': 'host not found in {}: {}'.format(name, host)
+                }
+            return {'ok': True, 'result': result[host]}
+
+
+class ConfigServers:
+    ''' The ConfigServer of each served project, by project name '''
+
+    def __init__(self, projects, interval=1.0):
+        self.interval = interval
+        self.servers = collections.OrderedDict()
+        for project in projects:
+            if project.name in self.servers:
+                raise ValueError('duplicate project name: ' + project.name)
+            self.servers[project.name] = ConfigServer(project, interval)
+
+    def handle(self, line):
+        request = line.split()
+        name = None
+        if request and request[0].startswith('@'):
+            name = request.pop(0)[1:]
+
+        if not request:
+            return {'ok': False, 'error': 'empty request'}
+
+        if request[0] == 'list' and len(request) == 1:
+            return {'ok': True, 'result': configvars.variable_names()}
+        elif request[0] == 'projects' and len(request) == 1:
+            return {'ok': True, 'result': list(self.servers)}
+        elif request[0] == 'get' and len(request) in [2, 3]:
+            if name is None and len(self.servers) == 1:
+                name = next(iter(self.servers))
+            if name is None:
+                return {'ok': False, 'error': 'select a project with @<name>'}
+            if name not in self.servers:
+                return {'ok': False, 'error': 'project not found: ' + name}
+            return self.servers[name].get(*request[1:])
+
+        return {'ok': False, 'error': 'invalid request: ' + line.strip()}
+
+    def poll(self, stop):
+        while not stop.wait(self.interval):
+            for server in self.servers.values():
+                try:
+                    server.refresh()
+                except Exception:
+                    traceback.print_exc()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            response = self.server.config.handle(line.decode())
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=None, interval=1.0, projects=None):
+    '''
+    Serve the projects (default to the project of the current directory)
+    on a Unix socket until interrupted.
+    '''
+    path = path or default_socket()
+    remove_stale_socket(path)
+
+    config = ConfigServers(projects or [Project.default()], interval)
+    stop = threading.Event()
+    poller = threading.Thread(target=config.poll, args=(stop,), daemon=True)
+    poller.start()
+
+    server = _Server(path, _Handler)
+    server.config = config
+    print('Serving configuration variables of {} on {}'.format(
+        ', '.join(config.servers), path
+    ))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        os.remove(path)
+
+
+def query(request, path=None):
+    ''' Send one request to a running server and return the response '''
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or default_socket())
+        sock.sendall(request.encode() + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        return json.loads(sock.makefile().readline())
@@ -0,0 +1,115 @@
+'''
+Snapshot of the deployed configuration variables and per-host diff
+against it, so that a deploy can be limited to the affected hosts.
+
+Items of lists are matched by identity (bond name, BGP neighbor, VLAN...)
+rather than by position, so an insertion reports one added item instead
+of every following item as changed.
+'''
+import collections
+import json
+import os
+
+# Fields that identify an item of a list, in order of preference
+IDENTITY_KEYS = ('name', 'neighbor', 'bond', 'vlan', 'bonds')
+
+# Ansible pattern that matches no host, an empty --limit matches them all
+NO_HOSTS = '!all'
+
+
+def default_snapshot():
+    return os.path.join(os.getcwd(), '.cumulus_snapshot.json')
+
+
+def save_snapshot(hosts, path=None):
+    ''' Save the per-host variables, see 'export.host_variables' '''
+    path = path or default_snapshot()
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(hosts, f, indent=4)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path=None):
+    path = path or default_snapshot()
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _keyed(items):
+    '''
+    Return a list of dicts as a dict keyed by the items identity, or None
+    when the items have no unique identity.
+    '''
+    if not items or not all(isinstance(i, dict) for i in items):
+        return None
+
+    for key in IDENTITY_KEYS:
+        if all(key in i for i in items):
+            ids = [str(i[key]) for i in items]
+            if len(set(ids)) == len(ids):
+                return collections.OrderedDict(zip(ids, items))
+
+    return None
+
+
+def _path(path, key, keyed=False):
+    if keyed:
+        return '{}[{}]'.format(path, key)
+    return '{}.{}'.format(path, key) if path else key
+
+
+def _diff(old, new, path, delta):
+    if isinstance(old, list) and isinstance(new, list):
+        _old, _new = _keyed(old), _keyed(new)
+        if _old is not None and _new is not None:
+            return _diff_dict(_old, _new, path, delta, keyed=True)
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        return _diff_dict(old, new, path, delta)
+
+    if old != new:
+        delta['changed'].append(path)
+
+
+def _diff_dict(old, new, path, delta, keyed=False):
+    for key in new:
+        if key not in old:
+            delta['added'].append(_path(path, key, keyed))
+    for key in old:
+        if key not in new:
+            delta['removed'].append(_path(path, key, keyed))
+        else:
+            _diff(old[key], new[key], _path(path, key, keyed), delta)
+
+
+def diff_hosts(old, new):
+    '''
+    Return the minimal delta of each changed host:
+    {
+        "leaf01": {
+            "added": ["vlans_interface.l2svi[vlan300]"],
+            "removed": [],
+            "changed": ["bgp_neighbors.default.neighbors[swp51].remote_as"]
+        }
+    }
+    '''
+    hosts = collections.OrderedDict()
+    for host in list(new) + [h for h in old if h not in new]:
+        delta = {'added': [], 'removed': [], 'changed': []}
+        _diff_dict(old.get(host, {}), new.get(host, {}), '', delta)
+        if any(delta.values()):
+            hosts[host] = delta
+
+    return hosts
+
+
+def limit(delta):
+    '''
+    Return the changed hosts as an Ansible '--limit' pattern, NO_HOSTS when
+    no host changed.
+    '''
+    return ','.join(delta) or NO_HOSTS
@@ -1,27 +1,86 @@
+import atexit
 import collections
 import json
-import functools
 import itertools
 import os
 import re
-import yaml
+import threading
+import types
 
 import netaddr
-from ansible.inventory.manager import InventoryManager
-from ansible.parsing.dataloader import DataLoader
 from ansible.errors import AnsibleError
 
 from cumulus_vxconfig.utils.filters import Filters
+from cumulus_vxconfig.utils.inventory import (
+    InventoryParseError, parse_inventory
+)
+from cumulus_vxconfig.utils.masterfile import MasterFile
+from cumulus_vxconfig.utils.portmap import PortMap
+from cumulus_vxconfig.utils.records import LinkNode
 
 filter = Filters()
 
 
-class File:
+class _StateTable:
+    '''
+    In-memory copy of a state file: 'disk' is the JSON content of the file
+    on disk (None if missing), 'content' the JSON content last dumped.
+    '''
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r') as f:
+                self.disk = f.read()
+        except FileNotFoundError:
+            self.disk = None
+        self.content = self.disk if self.disk is not None else '{}'
+
+    @property
+    def dirty(self):
+        # A missing file reads as an empty table, it is not written unless
+        # something is dumped in it
+        return self.content != (self.disk if self.disk is not None else '{}')
+
+    def flush(self):
+        ''' Write the content to disk and return the bytes written '''
+        content = self.content.encode()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, self.path)
+        self.disk = self.content
+        return len(content)
 
-    def __init__(self, fname=None):
 
+def _default_project():
+    from cumulus_vxconfig.utils.project import Project
+    return Project.default()
+
+
+class File:
+    '''
+    master.yml of a project, or a JSON state file in the project state
+    directory (~/.cumulus_vxconfig by default) when 'fname' is given.
+
+    State files are write-back: they are read from disk once per run,
+    'dump' only updates the in-memory table, and the changed tables are
+    written at most once, atomically, by 'File.flush'. The callers flush
+    explicitly (Project.flush, the cli, the projects workers), the atexit
+    hook is a fallback only: it does not run in the workers of a process
+    pool or after os._exit.
+    '''
+    _tables = {}
+    _lock = threading.RLock()
+
+    @staticmethod
+    def default_state_dir():
         user = os.environ.get('USER')
-        config_dir = "/home/{}/.cumulus_vxconfig".format(user)
+        return "/home/{}/.cumulus_vxconfig".format(user)
+
+    def __init__(self, fname=None, project=None):
+
+        self.project = project if project is not None else _default_project()
+        config_dir = self.project.state_dir
 
         try:
             os.makedirs(config_dir)
@@ -33,34 +92,67 @@ class File:
             self.fname = fname
             self.path = '{}/{}.json'.format(config_dir, fname)
 
-            if not os.path.isfile(self.path):
-                with open(self.path, 'w') as f:
-                    json.dump({}, f)
-
-            with open(self.path, 'r') as f:
-                self.data = json.load(f)
+            with self._lock:
+                if self.path not in self._tables:
+                    self._tables[self.path] = _StateTable(self.path)
+                self.data = json.loads(self._tables[self.path].content)
         else:
-            try:
-                path = os.getcwd() + '/master.yml'
-            except FileNotFoundError as err:
-                print(err)
-
-            with open(path, 'r') as f:
-                self.masterfile = yaml.safe_load(f)
+            self.masterfile = self.master()
 
     def dump(self):
-        with open(self.path, 'w') as f:
-            json.dump(self.data, f)
+        with self._lock:
+            self._tables[self.path].content = json.dumps(self.data)
         return self.data
 
-    def master(self):
-        try:
-            path = os.getcwd() + '/master.yml'
-        except FileNotFoundError as err:
-            print(err)
+    @classmethod
+    def _state_tables(cls, state_dir=None):
+        return [
+            table for table in cls._tables.values()
+            if state_dir is None
+            or os.path.dirname(table.path) == state_dir.rstrip('/')
+        ]
 
-        with open(path, 'r') as f:
-            return yaml.safe_load(f)
+    @classmethod
+    def flush(cls, state_dir=None):
+        '''
+        Write the state files changed since the last flush, of a state
+        directory only if given. Return the bytes written per file.
+        '''
+        written = {}
+        with cls._lock:
+            for table in cls._state_tables(state_dir):
+                if table.dirty:
+                    written[table.path] = table.flush()
+        return written
+
+    @classmethod
+    def reset(cls, state_dir=None):
+        ''' Flush and forget the state files, they are read again '''
+        with cls._lock:
+            for table in cls._state_tables(state_dir):
+                if table.dirty:
+                    table.flush()
+                del cls._tables[table.path]
+
+    _masterfiles = {}
+
+    def master(self):
+        '''
+        Return the section-lazy master.yml, shared by the callers until the
+        file changes.
+        '''
+        path = self.project.file_path('master.yml')
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._masterfiles.get(path)
+            self.project.metrics.cache(
+                'master', cached is not None and cached[0] == signature
+            )
+            if cached is None or cached[0] != signature:
+                cached = (signature, MasterFile(path))
+                self._masterfiles[path] = cached
+            return cached[1]
 
     @property
     def default(self):
@@ -81,6 +173,10 @@ class File:
         return default[self.fname]
 
 
+# Fallback only, see File
+atexit.register(File.flush)
+
+
 class Interface:
 
     def __init__(self, interface):
@@ -162,23 +258,96 @@ class Network(netaddr.IPNetwork):
         else:
             raise AnsibleError('Run out of subnets')
 
+    def get_subnets(self, existing_networks, count, prefixlen=24):
+        '''
+        Get the next 'count' unique subnets of a network given an existing
+        networks. The free address space is computed once and the subnets
+        are carved arithmetically in ascending order, same as calling
+        'get_subnet' count times.
+        '''
+        available_networks = (
+            netaddr.IPSet(self.cidr) - netaddr.IPSet(
+                netaddr.cidr_merge([Network(net) for net in existing_networks])
+            )
+        )
+        width = 32 if self.version == 4 else 128
+        step = 1 << (width - prefixlen)
+
+        subnets = []
+        for net in available_networks.iter_cidrs():
+            if len(subnets) == count:
+                break
+            if net.prefixlen > prefixlen:
+                continue
+
+            blocks = min(net.size // step, count - len(subnets))
+            for idx in range(blocks):
+                subnets.append('{}/{}'.format(
+                    netaddr.IPAddress(net.first + idx * step, self.version),
+                    prefixlen
+                ))
+
+        if len(subnets) < count:
+            raise AnsibleError('Run out of subnets')
+
+        existing_networks.extend(subnets)
+        return subnets
+
+    @property
+    def usable_range(self):
+        ''' Return the first and last usable IP address as integer '''
+        first, last = self.first, self.last
+        if self.version == 4:
+            if self.prefixlen < 31:
+                first, last = first + 1, last - 1
+        elif self.prefixlen < 127:
+            first = first + 1
+
+        return first, last
+
+    def endpoints(self, addr=False):
+        '''
+        Return the two IP addresses of a point-to-point network (/30 or /31)
+        '''
+        first, _ = self.usable_range
+        ips = []
+        for value in first, first + 1:
+            ip = str(netaddr.IPAddress(value, self.version))
+            ips.append(ip if addr else '{}/{}'.format(ip, self.prefixlen))
+
+        return ips
+
     def get_ip(self, index, lo=False, addr=False):
-        ''' Return an IP address given index '''
-        try:
-            ip_addr = list(self.__iter__())[index - 1]
-            if lo:
-                return ip_addr.replace(str(self.prefixlen), '32')
-            elif addr:
-                return ip_addr.split('/')[0]
-            else:
-                return ip_addr
-        except IndexError:
-            err = True
+        '''
+        Return an IP address given index, the index-th usable address (from
+        the last one when index <= 0), without enumerating the network.
+        '''
+        first, last = self.usable_range
+        size = last - first + 1
+        i = index - 1
+        if i < 0:
+            i += size
+        if not 0 <= i < size:
+            raise AnsibleError('Run out of IP addresses')
+
+        ip_addr = '{}/{}'.format(
+            netaddr.IPAddress(first + i, self.version), self.prefixlen
+        )
+        if lo:
+            return ip_addr.replace(str(self.prefixlen), '32')
+        elif addr:
+            return ip_addr.split('/')[0]
         else:
-            err = False
+            return ip_addr
 
-        if err:
-            raise AnsibleError('Run out of IP addresses')
+    @staticmethod
+    def summarize(prefixes):
+        '''
+        Return the minimal list of aggregates covering exactly the prefixes,
+        e.g. ['10.1.0.0/24', '10.1.1.0/24', '10.1.3.0/25'] ->
+        ['10.1.0.0/23', '10.1.3.0/25']
+        '''
+        return [str(net) for net in netaddr.cidr_merge(prefixes)]
 
     def overlaps(self, other):
         ''' Return True if one IP network overlaps with other IP network '''
@@ -210,7 +379,7 @@ class Host:
 
     def __init__(self, host):
         self.host = host
-        self.name_split = re.split('(\\d)', self.host)
+        self.name_split = re.split('(\\d+)', self.host)
 
     @property
     def base_name(self):
@@ -240,26 +409,123 @@ class Host:
         else:
             peer_host_id = self.id + 1
 
-        return self.base_name + str(peer_host_id)
+        # Keep the zero padding of the name, e.g. leaf01 -> leaf02
+        return self.base_name + str(peer_host_id).zfill(
+            len(self.name_split[-2])
+        )
+
+    @property
+    def peer_hosts(self):
+        '''
+        Candidate names of the MLAG peer. A padded name has a padded peer
+        (leaf01 -> leaf02) but leaf10 may have leaf09 or leaf9 as its peer,
+        only the inventory can tell which one exists.
+        '''
+        peer_host = self.peer_host
+        unpadded = self.base_name + str(Host(peer_host).id)
+        if unpadded == peer_host or self.name_split[-2].startswith('0'):
+            return [peer_host]
+        return [peer_host, unpadded]
 
     @property
     def group(self):
         return self.base_name
 
 
-class Inventory:
+class Topology:
+    '''
+    Index of the inventory topology, built once from the groups:
+    host_groups: host -> groups of the host (without 'all')
+    group_hosts: group -> frozenset of the hosts in the group
+    host_rack: leaf -> rack
+    rack_hosts: rack -> leafs, in inventory order
+    mlag_peer: leaf -> MLAG peer leaf, when the peer is in the inventory
+    '''
+    def __init__(self, groups_dict):
+        self.group_hosts = {}
+        self.host_groups = collections.defaultdict(list)
+        for group, hosts in groups_dict.items():
+            self.group_hosts[group] = frozenset(hosts)
+            if group != 'all':
+                for host in hosts:
+                    self.host_groups[host].append(group)
+
+        self.host_rack = {}
+        self.rack_hosts = collections.defaultdict(list)
+        for host in groups_dict.get('leaf', []):
+            rack = Host(host).rack
+            self.host_rack[host] = rack
+            self.rack_hosts[rack].append(host)
+
+        self.mlag_peer = {}
+        for host in self.host_rack:
+            for peer in Host(host).peer_hosts:
+                if peer in self.host_rack:
+                    self.mlag_peer[host] = peer
+                    break
 
-    def __init__(self, host=None):
+    def merge_groups(self, items):
+        '''
+        Merge the items of the groups into the items of their hosts, for
+        the hosts that are keys of 'items':
+        {'leaf': {a}, 'leaf01': {b}} -> {'leaf': {a}, 'leaf01': {a, b}}
+        '''
+        all_hosts = self.group_hosts.get('all', frozenset())
+        for host in [h for h in items if h in all_hosts]:
+            groups = [
+                items[g] for g in self.host_groups[host]
+                if g in items and g != host
+            ]
+            items[host] = set().union(*groups) | items[host]
 
-        inventory_file = os.getcwd() + '/devices'
-        loader = DataLoader()
-        self.inventory = (
-            InventoryManager(loader=loader, sources=[inventory_file])
-        )
+        return items
+
+
+class Inventory:
+
+    def __init__(self, host=None, project=None):
 
-        self.add_rack_group()
+        self.project = project if project is not None else _default_project()
+        inventory_file = self.project.file_path('devices')
+        try:
+            self._groups = parse_inventory(inventory_file)
+        except InventoryParseError:
+            # Dynamic inventories, plugins and the like are left to Ansible
+            from ansible.inventory.manager import InventoryManager
+            from ansible.parsing.dataloader import DataLoader
+
+            loader = DataLoader()
+            self._groups = InventoryManager(
+                loader=loader, sources=[inventory_file]
+            ).get_groups_dict()
+
+        # The rack groups are added on first use, see 'groups_dict'
+        self._rack_groups = False
+        self._topology = None
+        self._group_sets = {}
         self.check_host_ids()
 
+    @property
+    def groups_dict(self):
+        if not self._rack_groups:
+            self.add_rack_group()
+            self._rack_groups = True
+        return self._groups
+
+    @property
+    def topology(self):
+        if self._topology is None:
+            self._topology = Topology(self.groups_dict)
+        return self._topology
+
+    def in_group(self, host, group='all'):
+        ''' Same as "host in self.hosts(group)" with an O(1) lookup '''
+        try:
+            hosts = self._group_sets[group]
+        except KeyError:
+            hosts = self._group_sets[group] = frozenset(self.hosts(group))
+        return host in hosts
+
     def check_host_ids(self):
         # Check for duplicate host IDs each group
         main_groups = ['leaf', 'spine', 'border']
@@ -281,23 +547,26 @@ class Inventory:
 
     def add_rack_group(self):
 
-        racks = File().master()['mlag_bonds']
+        racks = self.project.master['mlag_bonds']
+        rack_hosts = collections.defaultdict(list)
         for host in self.hosts('leaf'):
-            _host = Host(host)
-            for rack in racks:
-                self.inventory.add_group(rack)
-                if _host.rack == rack:
-                    self.inventory.add_host(host, group=rack)
+            rack_hosts[Host(host).rack].append(host)
+
+        for rack in racks:
+            self._groups[rack] = rack_hosts[rack]
 
     def group_names(self):
         return [
-            k for k in self.inventory.get_groups_dict()
+            k for k in self.groups_dict
             if k != 'all' and k != 'ungrouped'
         ]
 
     def hosts(self, group='all'):
 
-        groups_dict = self.inventory.get_groups_dict()
+        if group in self._groups:
+            return self._groups[group]
+
+        groups_dict = self.groups_dict
         host_found = True
         try:
             return groups_dict[group]
@@ -313,21 +582,20 @@ class Inventory:
 
     def groups(self, host, primary=False):
 
-        if host in self.hosts():
+        if self.in_group(host):
 
             _host = Host(host)
             if primary:
-                if _host.group in self.group_names():
+                group_hosts = self.topology.group_hosts
+                if (_host.group in group_hosts
+                        and _host.group not in ['all', 'ungrouped']):
                     return _host.group
                 else:
                     raise AnsibleError(
                         'group not found in inventory: %s' % _host.group
                     )
 
-            return [
-                k for k, v in self.inventory.get_groups_dict().items()
-                if host in v and k != 'all'
-            ]
+            return list(self.topology.host_groups[host])
         else:
             raise AnsibleError('host not found in inventory: %s' % host)
 
@@ -336,13 +604,23 @@ class Link:
     '''
     Class that trasform a link string format into a stuctured data
     Example: 'spine:swp1 -- leaf:swp21'
+
+    The duplicate links and overlapping interfaces raise an AnsibleError at
+    once unless 'check' is False, then the caller reports them, see
+    'duplicates' and 'port_map'.
     '''
-    def __init__(self, variable, _links):
+    def __init__(self, variable, _links, inventory=None, check=True):
 
         self.links = _links
         self.var = variable
+        self.inventory = (
+            inventory if inventory is not None
+            else _default_project().inventory
+        )
+        self._link_nodes = None
 
-        self.check_overlapping_interfaces
+        if check:
+            self.check_overlapping_interfaces
 
     def _link(self, __link, item_id=False):
 
@@ -356,13 +634,13 @@ class Link:
             dev_a, a_port, dev_b, b_port = _link
 
             data = (
-                sorted(Inventory().hosts(dev_a)),
+                sorted(self.inventory.hosts(dev_a)),
                 filter.uncluster(
-                    Interface(a_port) + len(Inventory().hosts(dev_b))
+                    Interface(a_port) + len(self.inventory.hosts(dev_b))
                     ),
-                sorted(Inventory().hosts(dev_b)),
+                sorted(self.inventory.hosts(dev_b)),
                 filter.uncluster(
-                    Interface(b_port) + len(Inventory().hosts(dev_a)),
+                    Interface(b_port) + len(self.inventory.hosts(dev_a)),
                 )
             )
 
@@ -391,7 +669,7 @@ class Link:
                         yield connections, net_id
 
     def _group(self, host):
-        return Inventory().groups(host, primary=True)
+        return self.inventory.groups(host, primary=True)
 
     def __iter__(self):
         ''' Return values:
@@ -417,77 +695,61 @@ class Link:
                 s.add(item[1])
         return iter(sorted(s))
 
-    @functools.lru_cache(maxsize=128)
     def link_nodes(self):
         ''' Return values:
         {
             "spine01:swp1 -- leaf01:swp21": [
-                {
-                    "host": "spine01",
-                    "interface": "swp1",
-                    "neighbor": "leaf01",
-                    "ngroup": "leaf",
-                    "ninterface": "swp21"
-                },
-                {
-                    "host": "leaf01",
-                    "interface": "swp21",
-                    "neighbor": "spine01",
-                    "ngroup": "spine",
-                    "ninterface": "swp1"
-                }
+                LinkNode(
+                    host='spine01', interface='swp1', neighbor='leaf01',
+                    ngroup='leaf', ninterface='swp21'
+                ),
+                LinkNode(
+                    host='leaf01', interface='swp21', neighbor='spine01',
+                    ngroup='spine', ninterface='swp1'
+                )
             ]
         }
         '''
+        if self._link_nodes is not None:
+            return self._link_nodes
+
         link_nodes = collections.defaultdict(list)
         for link in self.links:
             links = self._link(link)
             for item in links:
                 host, port, nei, nei_port = item[0]
-                link_nodes[item[1]].append({
-                    'host': host, 'interface': port,
-                    'neighbor': nei, 'ngroup': self._group(nei),
-                    'ninterface': nei_port
-                })
+                link_nodes[item[1]].append(
+                    LinkNode(host, port, nei, self._group(nei), nei_port)
+                )
+        self._link_nodes = link_nodes
         return link_nodes
 
-    @functools.lru_cache(maxsize=128)
-    def device_interfaces(self):
-        ''' Return values:
-        {
-            "spine": [
-                [
-                    "swp1",
-                    "spine:swp1 -- leaf:swp21 --> spine:['swp1', 'swp2','swp3', 'swp4'] -- leaf:['swp21', 'swp22']"
-                ],
-                [
-                    "swp2",
-                    "spine:swp1 -- leaf:swp21 --> spine:['swp1', 'swp2','swp3', 'swp4'] -- leaf:['swp21', 'swp22']"
-                ]
-            ]
-        }
+    def port_map(self, portmap=None):
         '''
-        device_interfaces = collections.defaultdict(set)
-        for link in self.links:
-            links = self._link(link, item_id=True)
-            for item in links:
-                dev, port, item_link = item
-                device_interfaces[dev].add(
-                    (port, item_link, 'network_links', self.var)
-                    )
+        Claim the interfaces of the links in a PortMap (a new one by
+        default) and return it, the owner of a port is its link:
+        PortClaim(
+            source='network_links', name='fabric',
+            item="spine:swp1 -- leaf:swp21  (spine:swp1-4 -- leaf:swp21)"
+        )
+        '''
+        if portmap is None:
+            portmap = PortMap(self.inventory)
 
-        hosts = [h for h in device_interfaces if h in Inventory().hosts()]
-        for host in hosts:
-            x = device_interfaces[host]
-            for k, v in device_interfaces.items():
-                if host in Inventory().hosts(k):
-                    device_interfaces[host] = device_interfaces[k] | x
+        for link in self.links:
+            for dev, port, item_link in self._link(link, item_id=True):
+                portmap.claim(dev, port, 'network_links', self.var, item_link)
 
-        interfaces_links = {}
-        for k, v in device_interfaces.items():
-            interfaces_links[k] = list(v)
+        return portmap
 
-        return interfaces_links
+    def duplicates(self):
+        ''' Return the links listed more than once, in order '''
+        seen, duplicates = set(), []
+        for link in self.links:
+            if link in seen and link not in duplicates:
+                duplicates.append(link)
+            seen.add(link)
+        return duplicates
 
     @property
     def check_overlapping_interfaces(self):
@@ -503,24 +765,72 @@ class Link:
                 {'network_links': {self.var: {'links': list(error)}}}
             )
 
-        for item in itertools.combinations(self.links, 2):
-            link_a, link_b = item
-            if link_a == link_b:
-                msg = ("Duplicate link: '{}'\n"
-                       "Refer to the errors below and to your "
-                       "'master.yml' file.\n{}")
-                raise AnsibleError(msg.format(link_a, err_items(item)))
-
-        device_interfaces = self.device_interfaces()
-        for k, v in device_interfaces.items():
-            for link in itertools.combinations(v, 2):
-                link_a, link_b = link
-                if link_a[0] == link_b[0]:
-                    error = link_a[1], link_b[1]
-                    msg = ("Overlapping link interfaces: '{}'\n"
-                           "Refer to the errors below and to your "
-                           "'master.yml' file.\n{}")
+        for link in self.duplicates():
+            msg = ("Duplicate link: '{}'\n"
+                   "Refer to the errors below and to your "
+                   "'master.yml' file.\n{}")
+            raise AnsibleError(msg.format(link, err_items((link, link))))
 
-                    raise AnsibleError(
-                        msg.format(link_a[0], err_items(error))
-                    )
+        portmap = self.port_map()
+        for (host, port), owners in portmap.conflicts.items():
+            error = owners[0].item, owners[1].item
+            msg = ("Overlapping link interfaces: '{}'\n"
+                   "Refer to the errors below and to your "
+                   "'master.yml' file.\n{}")
+
+            raise AnsibleError(msg.format(port, err_items(error)))
+
+
+class VlanTable:
+    '''
+    Immutable table of the tenant VLANs and their L3VNI, built once from
+    the 'vlans' variable in master.yml and the l3vni.json allocations.
+
+    Every record is a read-only mapping with the master.yml attributes plus
+    'tenant', 'type', 'vlan' and 'index'. The indexes are read-only views
+    and must not be copied by callers.
+    '''
+    def __init__(self, master_vlans, l3vni):
+        self.master = master_vlans
+
+        by_id, by_vlan, l3vni_map = {}, {}, {}
+        by_tenant = collections.defaultdict(list)
+        by_type = collections.defaultdict(list)
+
+        records = []
+        for tenant, vlans in master_vlans.items():
+            for index, vlan in enumerate(vlans):
+                record = dict(vlan)
+                record.update({
+                    'tenant': tenant, 'type': 'l2',
+                    'vlan': 'vlan' + vlan['id'], 'index': index
+                })
+                records.append(types.MappingProxyType(record))
+
+            if tenant in l3vni:
+                record = types.MappingProxyType(dict(l3vni[tenant]))
+                l3vni_map[tenant] = record
+                records.append(record)
+
+        for record in records:
+            by_id[record['id']] = record
+            by_vlan[record['vlan']] = record
+            by_tenant[record['tenant']].append(record)
+            by_type[record['type']].append(record)
+
+        self.records = tuple(records)
+        self.by_id = types.MappingProxyType(by_id)
+        self.by_vlan = types.MappingProxyType(by_vlan)
+        self.by_tenant = types.MappingProxyType(
+            {k: tuple(v) for k, v in by_tenant.items()}
+        )
+        self.by_type = types.MappingProxyType(
+            {k: tuple(v) for k, v in by_type.items()}
+        )
+        self.l3vni = types.MappingProxyType(l3vni_map)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
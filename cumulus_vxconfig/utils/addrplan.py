@@ -0,0 +1,125 @@
+import netaddr
+
+from ansible.errors import AnsibleError
+
+from cumulus_vxconfig.utils import MACAddr, Network
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+BASE_VHWADDR = MACAddr('44:38:39:FF:01:00').value
+
+
+def _format_ip(value, version):
+    if version == 4:
+        return '{}.{}.{}.{}'.format(
+            value >> 24, (value >> 16) & 255, (value >> 8) & 255, value & 255
+        )
+    return str(netaddr.IPAddress(value, version))
+
+
+def _format_mac(value):
+    return ':'.join(
+        '{:02x}'.format((value >> shift) & 255)
+        for shift in range(40, -8, -8)
+    )
+
+
+class AddressPlan:
+    '''
+    Batch address plan of the VLAN SVIs.
+
+    The gateway VIPs, the per-host SVI IPs and the virtual MACs of every
+    (host, VLAN) pair are computed in one pass with integer arithmetic over
+    arrays (NumPy when available). Strings are only formatted when a value
+    is requested.
+
+    Parameters
+    ----------
+    vlans: list
+        [('vlan100', '100', '10.1.0.0/24'), ...]
+    host_ids: list
+        Host IDs of the hosts that have an SVI, see 'Host.id'.
+    '''
+    def __init__(self, vlans, host_ids):
+        self.vlans = {}
+        self.host_ids = {}
+
+        networks, vids = [], []
+        for idx, (vlan, vid, prefix) in enumerate(vlans):
+            self.vlans[vlan] = idx
+            networks.append(Network(prefix))
+            vids.append(int(vid))
+
+        for host_id in sorted(set(host_ids)):
+            self.host_ids[host_id] = len(self.host_ids)
+
+        self.networks = networks
+        self.prefixes = [str(net) for net in networks]
+        self.versions = [net.version for net in networks]
+
+        ranges = [net.usable_range for net in networks]
+        first = [r[0] for r in ranges]
+        last = [r[1] for r in ranges]
+        ids = list(self.host_ids)
+
+        if numpy is not None and all(v == 4 for v in self.versions):
+            first = numpy.array(first, dtype=numpy.int64)
+            last = numpy.array(last, dtype=numpy.int64)
+            _ids = numpy.array(ids, dtype=numpy.int64)[:, numpy.newaxis]
+
+            vids = numpy.array(vids, dtype=numpy.int64)
+
+            self._first, self._last = first, last
+            self._vhwaddr = BASE_VHWADDR + vids
+            # 'Network.get_ip(-id)' is the id-th address from the last
+            # usable address of the network.
+            self._svi = last[numpy.newaxis, :] - _ids
+            self._svi_valid = self._svi >= first[numpy.newaxis, :]
+        else:
+            self._first, self._last = first, last
+            self._vhwaddr = [BASE_VHWADDR + vid for vid in vids]
+            self._svi = [[v - i for v in last] for i in ids]
+            self._svi_valid = [
+                [ip >= f for ip, f in zip(row, first)] for row in self._svi
+            ]
+
+    def _ip(self, idx, value, addr=False):
+        ip = _format_ip(int(value), self.versions[idx])
+        if addr:
+            return ip
+        return '{}/{}'.format(ip, self.networks[idx].prefixlen)
+
+    def network(self, vlan):
+        return self.prefixes[self.vlans[vlan]]
+
+    def vip(self, vlan):
+        ''' Return the gateway VIP, same as 'Network.get_ip(0)' '''
+        idx = self.vlans[vlan]
+        return self._ip(idx, self._last[idx])
+
+    def vhwaddr(self, vlan):
+        return _format_mac(int(self._vhwaddr[self.vlans[vlan]]))
+
+    def svi_ip(self, host_id, vlan):
+        ''' Return the SVI IP of a host, same as 'Network.get_ip(-host_id)' '''
+        idx, row = self.vlans[vlan], self.host_ids[host_id]
+        if not self._svi_valid[row][idx]:
+            raise AnsibleError('Run out of IP addresses')
+        return self._ip(idx, self._svi[row][idx])
+
+    def get_ip(self, vlan, index, addr=False):
+        ''' Return an IP address of a VLAN network given index, same as
+        'Network.get_ip' without enumerating the network. '''
+        idx = self.vlans[vlan]
+        first, last = int(self._first[idx]), int(self._last[idx])
+        size = last - first + 1
+        i = index - 1
+        if i < 0:
+            i += size
+        if not 0 <= i < size:
+            raise AnsibleError('Run out of IP addresses')
+        return self._ip(idx, first + i, addr=addr)
@@ -0,0 +1,100 @@
+import collections
+
+
+Session = collections.namedtuple('Session', [
+    'host', 'vrf', 'local_interface', 'neighbor', 'remote_as', 'remote_id',
+    'remote_host', 'remote_interface', 'peer_group'
+])
+
+
+class FabricAdjacency:
+    '''
+    Index of the BGP sessions of the fabric, built once from the hosts
+    router-ID/ASN table and the IP and unnumbered interfaces.
+
+    Parameters
+    ----------
+    routers: dict
+        {'spine01': {'as': 65000, 'router_id': '10.0.0.1'}, ...}
+    interfaces: list
+        List of host interfaces records, see 'ConfigVars._ip_interfaces'
+        and 'ConfigVars._unnumbered_interfaces'.
+    '''
+    def __init__(self, routers, interfaces):
+        self.routers = routers
+
+        self._hosts = collections.OrderedDict()
+        self._groups = collections.defaultdict(list)
+
+        for item in interfaces:
+            for host, ifaces in item.items():
+                vrfs = self._hosts.setdefault(
+                    host, collections.OrderedDict()
+                )
+                for iface, v in ifaces.items():
+                    n = v.neighbor
+                    if n is None:
+                        continue
+
+                    remote = routers[n.host]
+                    if n.address is None:
+                        remote_as, nei = 'external', iface
+                    else:
+                        remote_as, nei = remote['as'], n.address
+
+                    session = Session(
+                        host, v.vrf, iface, nei, remote_as,
+                        remote['router_id'], n.host, n.interface, n.group
+                    )
+                    vrfs.setdefault(v.vrf, []).append(session)
+                    self._groups[n.group].append(session)
+
+    def __iter__(self):
+        return iter(self._hosts)
+
+    def sessions(self, host, vrf=None):
+        ''' Return the BGP sessions of a host, optionally of a VRF only '''
+        vrfs = self._hosts.get(host, {})
+        if vrf is not None:
+            return list(vrfs.get(vrf, []))
+        return [session for v in vrfs.values() for session in v]
+
+    def group_sessions(self, group):
+        ''' Return the BGP sessions with a neighbor in a peer group '''
+        return list(self._groups.get(group, []))
+
+    def peer_groups(self, host, vrf):
+        ''' Return the peer groups of a host VRF in order of appearance '''
+        sessions = self._hosts.get(host, {}).get(vrf, [])
+        return list(collections.OrderedDict.fromkeys(
+            session.peer_group for session in sessions
+        ))
+
+    def vrfs(self, host):
+        '''
+        Return the BGP VRFs of a host:
+        {
+            "default": {
+                "router_id": "10.0.0.1",
+                "as": 65000,
+                "neighbors": [...],
+                "peer_groups": ["leaf", "border"]
+            }
+        }
+        '''
+        vrfs = {}
+        for vrf, sessions in self._hosts.get(host, {}).items():
+            router = self.routers[host]
+            vrfs[vrf] = {
+                'router_id': router['router_id'], 'as': router['as'],
+                'neighbors': [{
+                    'neighbor': s.neighbor, 'remote_as': s.remote_as,
+                    'remote_id': s.remote_id, 'peer_group': s.peer_group,
+                    'remote_host': s.remote_host,
+                    'remote_interface': s.remote_interface,
+                    'local_interface': s.local_interface
+                } for s in sessions],
+                'peer_groups': self.peer_groups(host, vrf)
+            }
+
+        return vrfs
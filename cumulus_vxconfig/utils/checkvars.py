@@ -1,21 +1,183 @@
 import collections
+import functools
+import hashlib
 import itertools
+import json
 import re
 import yaml
 
 from ansible.errors import AnsibleError
 from cumulus_vxconfig.utils.filters import Filters
-from cumulus_vxconfig.utils import File, Network, Link, Inventory, Host
+from cumulus_vxconfig.utils import Network, Link
+from cumulus_vxconfig.utils.portmap import PortMap
+from cumulus_vxconfig.utils.project import Project
 
 filter = Filters()
-mf = File().master()
-inventory = Inventory()
+
+# Bump when a check changes, to invalidate the persistent results
+CHECKS_VERSION = 4
+
+ServerBondIndex = collections.namedtuple(
+    'ServerBondIndex', ['servers', 'slaves', 'vids', 'racks']
+)
+
+
+class CheckError(collections.namedtuple(
+        'CheckError', ['check', 'title', 'path', 'details'])):
+    '''
+    Error found by a check in master.yml. 'path' locates the offending
+    item, 'details' is only called to build the full error message (with
+    its YAML snippets) when the error is reported.
+    '''
+    __slots__ = ()
+
+    @property
+    def message(self):
+        return self.details()
+
+
+def format_errors(errors, limit=None):
+    '''
+    Format the errors returned by 'CheckVars.check_all', only the first
+    'limit' error messages are built.
+    '''
+    lines = []
+    for idx, error in enumerate(errors[:limit], start=1):
+        lines.append('[{}/{}] {}: {}'.format(
+            idx, len(errors), error.check, error.message.rstrip()
+        ))
+
+    if limit is not None and len(errors) > limit:
+        lines.append('... {} more error(s) not shown'.format(
+            len(errors) - limit
+        ))
+
+    return '\n\n'.join(lines)
+
+
+def validation(*sections, hosts=False, result=None):
+    '''
+    Cache the result of a check per instance, and persistently by a hash of
+    the master.yml 'sections' (and the inventory if 'hosts') it depends on.
+
+    When the hash matches the one of a previous successful run the check is
+    skipped, the result is either rebuilt with 'result(self)' (cheap, e.g.
+    a master.yml section) or loaded from the persistent cache.
+    '''
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self):
+            if name in self._results:
+                return self._results[name]
+
+            key = hashlib.sha1(json.dumps([
+                CHECKS_VERSION, name, [self.mf.get(s) for s in sections],
+                self.inventory.groups_dict if hosts else None
+            ], default=str).encode()).hexdigest()
+
+            checks = self._checks()
+            cached = checks.data.get(name)
+            metrics = self.project.metrics
+            metrics.cache(
+                'checks', cached is not None and cached['key'] == key
+            )
+            if cached is not None and cached['key'] == key:
+                value = (
+                    result(self) if result is not None else cached['result']
+                )
+            else:
+                with metrics.timer('check_duration_seconds', check=name):
+                    value = func(self)
+                if not any(e.check == name for e in self.errors.values()):
+                    with self.project.lock:
+                        checks.data[name] = {
+                            'key': key,
+                            'result': value if result is None else None
+                        }
+                        checks.dump()
+
+            self._results[name] = value
+            return value
+
+        return wrapper
+
+    return decorator
 
 
 class CheckVars:
     '''
     Pre-Check of variables defined in master.yml
+
+    By default the checks raise an AnsibleError on the first conflict.
+    With 'collect=True' the errors are accumulated in 'errors' instead, so
+    that 'check_all' can report every error of master.yml in one run.
     '''
+    CHECKS = [
+        'vlans', 'mlag_bonds', 'mlag_peerlink_interfaces', 'base_networks',
+        'base_asn', 'interfaces', 'server_bonds'
+    ]
+
+    def __init__(self, project=None, collect=False):
+        self.project = project if project is not None else Project.default()
+        self.mf = self.project.master
+        self.collect = collect
+        self.errors = collections.OrderedDict()
+        self._results = {}
+
+        # The checks assume a master.yml well-formed against its schema.
+        # The sections are validated as they are loaded, in collect mode
+        # the whole file is validated at once and the schema errors are
+        # the only errors reported.
+        if collect:
+            for error in self.project.schema_errors():
+                self._error(
+                    'schema', error.message, ('schema',) + error.path,
+                    functools.partial(str, error)
+                )
+        self.inventory = None if self.errors else self.project.inventory
+
+    def _checks(self):
+        ''' The persistent results of the checks, loaded once per project '''
+        with self.project.lock:
+            if 'checks' not in self.project.cache:
+                self.project.cache['checks'] = self.project.state('checks')
+            return self.project.cache['checks']
+
+    def _error(self, check, title, path, details):
+        error = CheckError(check, title, tuple(path), details)
+        if not self.collect:
+            raise AnsibleError(error.message)
+
+        # The same error is found again when a check is re-evaluated
+        self.errors.setdefault(error[:3], error)
+
+    def check_all(self):
+        '''
+        Run every check and return the list of errors found, in collect
+        mode only, otherwise the first error is raised.
+        '''
+        if self.errors:
+            return list(self.errors.values())
+
+        for check in self.CHECKS:
+            try:
+                value = getattr(self, check)
+                if callable(value):
+                    value()
+            except AnsibleError as err:
+                # An error raised below the check (e.g. by a builder) is
+                # reported with the others instead of ending the run
+                if not self.collect:
+                    raise
+                self._error(
+                    check, str(err).split('\n', 1)[0], [check],
+                    functools.partial(str, str(err))
+                )
+
+        return list(self.errors.values())
+
     def _yaml_f(self, data, style="", flow=None, start=True):
         return yaml.dump(
             data, default_style=style,
@@ -24,8 +186,9 @@ class CheckVars:
         )
 
     @property
+    @validation('vlans', result=lambda self: self.mf['vlans'])
     def vlans(self):
-        master_vlans = mf['vlans']
+        master_vlans = self.mf['vlans']
 
         vids = []
         for tenant, vlans in master_vlans.items():
@@ -41,15 +204,19 @@ class CheckVars:
                     error[tenant] = v
             msg = ("VLANID conflict:\nRefer to the errors "
                    "below and check the 'master.yml' file\n{}")
-            raise AnsibleError(
-                msg.format(self._yaml_f({'vlans': error}))
+            self._error(
+                'vlans', 'VLANID conflict', ['vlans'],
+                lambda: msg.format(self._yaml_f({'vlans': error}))
             )
 
         return master_vlans
 
     @property
+    @validation(
+        'mlag_bonds', 'vlans', result=lambda self: self.mf['mlag_bonds']
+    )
     def mlag_bonds(self):
-        mlag_bonds = mf['mlag_bonds']
+        mlag_bonds = self.mf['mlag_bonds']
 
         vids = {}
         for tenant, vlans in self.vlans.items():
@@ -111,7 +278,7 @@ class CheckVars:
 
     def _mlag_bonds_error(self, rack, item, title):
         bonds = []
-        for bond in mf['mlag_bonds'][rack]:
+        for bond in self.mf['mlag_bonds'][rack]:
             if item in filter.uncluster(bond['members']):
                 bonds.append(bond)
             elif bond['name'] == item:
@@ -123,30 +290,42 @@ class CheckVars:
             msg = ("{}\nRefer to the errors below and "
                    "check the 'master.yml' file.\n{}")
 
-            raise AnsibleError(msg.format(
-                title, filter.yaml_format({'mlag_bonds': {rack: bonds}})
+            self._error(
+                'mlag_bonds', title, ['mlag_bonds', rack, item],
+                lambda: msg.format(
+                    title, filter.yaml_format({'mlag_bonds': {rack: bonds}})
                 )
             )
 
     @property
+    @validation(
+        'mlag_peerlink_interfaces',
+        result=lambda self: ','.join(
+            filter.uncluster(self.mf['mlag_peerlink_interfaces'])
+        )
+    )
     def mlag_peerlink_interfaces(self):
-        mlag_peerlink_interfaces = mf['mlag_peerlink_interfaces']
+        mlag_peerlink_interfaces = self.mf['mlag_peerlink_interfaces']
         ifaces = filter.uncluster(mlag_peerlink_interfaces)
 
         dup_ifaces = [i for i in set(ifaces) if ifaces.count(i) > 1]
         if len(dup_ifaces) > 0:
             msg = ("interfaces conflict:\nRefer to the errors below and "
                    "check the 'master.yml' file.\n{}")
-            raise AnsibleError(
-                msg.format(self._yaml_f({
+            self._error(
+                'mlag_peerlink_interfaces', 'interfaces conflict',
+                ['mlag_peerlink_interfaces'],
+                lambda: msg.format(self._yaml_f({
                     'mlag_peerlink_interfaces': mlag_peerlink_interfaces
-                }, flow=False)))
+                }, flow=False))
+            )
 
         return ','.join(ifaces)
 
     @property
+    @validation('base_networks', result=lambda self: self.mf['base_networks'])
     def base_networks(self):
-        base_networks = mf['base_networks']
+        base_networks = self.mf['base_networks']
 
         def networks():
             networks = collections.defaultdict(list)
@@ -170,20 +349,28 @@ class CheckVars:
                 nets = items[0][-1], items[1][-1]
                 net_a, net_b = sorted(nets)
                 if net_a.overlaps(net_b):
-                    return items
+                    yield items
 
-        if overlaps() is not None:
+        def details(items):
             error = collections.defaultdict(dict)
-            for item in overlaps():
+            for item in items:
                 if len(item) > 2:
                     error[item[0]][item[1]] = str(item[-1])
                 else:
                     error[item[0]] = str(item[-1])
             msg = ("networks conflict:\nRefer to the errors below and "
                    "check the 'master.yml' file.\n{}")
-            raise AnsibleError(
-                msg.format(self._yaml_f(
-                    {'base_networks': dict(error)}, flow=False))
+            return msg.format(self._yaml_f(
+                {'base_networks': dict(error)}, flow=False)
+            )
+
+        for items in overlaps():
+            path = ['base_networks'] + [
+                ':'.join(map(str, item[:-1])) for item in items
+            ]
+            self._error(
+                'base_networks', 'networks conflict', path,
+                functools.partial(details, items)
             )
 
         return base_networks
@@ -245,108 +432,118 @@ class CheckVars:
         return base_networks[name]
 
     @property
+    @validation(
+        'base_asn', hosts=True, result=lambda self: self.mf['base_asn']
+    )
     def base_asn(self):
-        base_asn = mf['base_asn']
+        base_asn = self.mf['base_asn']
+
+        def details(asn, x):
+            msg = ("duplicate AS: {}\n"
+                   "Refer to the errors below and check the "
+                   "'master.yml' file.\n{}")
+            return msg.format(asn, filter.yaml_format({'base_asn': x}))
+
         group_asn = ((k, v) for k, v in base_asn.items())
         for group_asn in itertools.combinations(group_asn, 2):
             g1, g2 = group_asn
             if g1[1] == g2[1]:
-                msg = ("duplicate AS: {}\n"
-                       "Refer to the errors below and check the "
-                       "'master.yml' file.\n{}")
                 x = {item[0]: item[1] for item in group_asn}
-                raise AnsibleError(
-                    msg.format(g1[1], filter.yaml_format({'base_asn': x}))
+                self._error(
+                    'base_asn', 'duplicate AS: {}'.format(g1[1]),
+                    ['base_asn', g1[0], g2[0]],
+                    functools.partial(details, g1[1], x)
                 )
 
+        group_names = self.inventory.group_names()
         for k, _ in base_asn.items():
-            if k not in inventory.group_names():
-                raise AnsibleError(
-                    'Group not found: {}'.format(k)
+            if k not in group_names:
+                self._error(
+                    'base_asn', 'Group not found', ['base_asn', k],
+                    functools.partial('Group not found: {}'.format, k)
                 )
 
         return base_asn
 
     @property
+    @validation(
+        'network_links', 'mlag_bonds', 'vlans', 'mlag_peerlink_interfaces',
+        hosts=True, result=lambda self: None
+    )
     def interfaces(self):
-        interfaces = collections.defaultdict(set)
+        # Every port of every device is claimed once, by its link, mlag
+        # bond or peerlink, a port claimed twice is a conflict
+        portmap = PortMap(self.inventory)
 
-        # Interfaces in links
-        net_links = mf['network_links']
+        # Interfaces in links, the duplicate links claim the same ports and
+        # are reported on their own
+        net_links = self.mf['network_links']
         for k, v in net_links.items():
-            links = Link(k, v['links'])
-            device_interfaces = links.device_interfaces()
-            for dev in device_interfaces:
-                re_order = []
-                for item in device_interfaces[dev]:
-                    port, link, var, name = item
-                    re_order.append((port, var, name, link))
-
-                for item in re_order:
-                    interfaces[dev].add(tuple(item))
+            links = Link(k, v['links'], self.inventory, check=False)
+            for link in links.duplicates():
+                yaml_vars = {'network_links': {k: {'links': [link, link]}}}
+                msg = ("Duplicate link: '{}'\n"
+                       "Refer to the errors below and check the "
+                       "'master.yml' file.\n{}").format(
+                           link, filter.yaml_format(yaml_vars)
+                       )
+                self._error(
+                    'interfaces', "duplicate link: '{}'".format(link),
+                    ['network_links', k, link], functools.partial(str, msg)
+                )
+            links.port_map(portmap)
 
         # Interface in mlag bonds
         mlag_bonds = self.mlag_bonds
         for rack, bonds in mlag_bonds.items():
-            items = []
+            hosts = self.inventory.topology.rack_hosts.get(rack, [])
             for idx, bond in enumerate(bonds):
-                members = filter.uncluster(bond['members'])
-                for member in members:
-                    items.append((member, 'mlag_bonds', rack, idx))
-
-            for host in inventory.hosts('leaf'):
-                _host = Host(host)
-                if rack == _host.rack:
-                    for item in items:
-                        interfaces[host].add(tuple(item))
+                for member in filter.uncluster(bond['members']):
+                    for host in hosts:
+                        portmap.claim(host, member, 'mlag_bonds', rack, idx)
 
         # Interfaces peerlink
-        ifaces = filter.uncluster(mf['mlag_peerlink_interfaces'])
-        for host in inventory.hosts('leaf'):
-            for iface in ifaces:
-                item = (
-                    iface,
-                    'mlag_peerlink_interfaces',
-                    mf['mlag_peerlink_interfaces']
-                )
-                interfaces[host].add(tuple(item))
-
-        hosts = [h for h in interfaces if h in inventory.hosts()]
-        for host in hosts:
-            x = interfaces[host]
-            for k, v in interfaces.items():
-                if host in inventory.hosts(k):
-                    interfaces[host] = interfaces[k] | x
-
-        for k, v in interfaces.items():
-            ports = [item[0] for item in v]
-            dup_ports = [item for item in set(ports) if ports.count(item) > 1]
-            if len(dup_ports):
-                error_items = [i for i in v if i[0] == dup_ports[0]]
-                yaml_vars = collections.defaultdict(dict)
-                for item in error_items:
-                    port, mfvar, name, *r = item
-                    if mfvar == 'network_links':
-                        yaml_vars[mfvar][name] = {'links': [r[0]]}
-                    elif mfvar == 'mlag_bonds':
-                        yaml_vars[mfvar][name] = mf[mfvar][name][r[0]]
-                    elif mfvar == 'mlag_peerlink_interfaces':
-                        yaml_vars[mfvar] = name
-
-                _yaml_vars = {}
-                for k, v in yaml_vars.items():
-                    if isinstance(v, collections.defaultdict):
-                        _yaml_vars.update({k: dict(v)})
-                    else:
-                        _yaml_vars.update({k: v})
-
-                msg = ("overlapping interface: '{}'\n"
-                       "Refer to the errors below and check the "
-                       "'master.yml' file.\n{}")
-
-                raise AnsibleError(
-                    msg.format(port, filter.yaml_format(_yaml_vars))
-                )
+        peerlink = self.mf['mlag_peerlink_interfaces']
+        for iface in filter.uncluster(peerlink):
+            portmap.claim('leaf', iface, 'mlag_peerlink_interfaces', peerlink)
+
+        def details(port, owners):
+            yaml_vars = collections.defaultdict(dict)
+            for mfvar, name, item in owners:
+                if mfvar == 'network_links':
+                    yaml_vars[mfvar][name] = {'links': [item]}
+                elif mfvar == 'mlag_bonds':
+                    yaml_vars[mfvar][name] = self.mf[mfvar][name][item]
+                elif mfvar == 'mlag_peerlink_interfaces':
+                    yaml_vars[mfvar] = name
+
+            _yaml_vars = {}
+            for k, v in yaml_vars.items():
+                if isinstance(v, collections.defaultdict):
+                    _yaml_vars.update({k: dict(v)})
+                else:
+                    _yaml_vars.update({k: v})
+
+            msg = ("overlapping interface: '{}'\n"
+                   "Refer to the errors below and check the "
+                   "'master.yml' file.\n{}")
+
+            return msg.format(port, filter.yaml_format(_yaml_vars))
+
+        # A conflict between groups is found on every host of the groups
+        # (and on every port of a range), it is reported once per pair of
+        # master.yml items
+        reported = set()
+        for (host, port), owners in portmap.conflicts.items():
+            items = tuple(owners)
+            if items in reported:
+                continue
+            reported.add(items)
+            self._error(
+                'interfaces', "overlapping interface: '{}'".format(port),
+                ['interfaces', host, port],
+                functools.partial(details, port, list(owners))
+            )
 
     def _mlag_bonds(self, key='name'):
         mlag_bonds = self.mlag_bonds
@@ -362,111 +559,122 @@ class CheckVars:
 
         return x
 
-    def _server_bonds(self, key='name'):
-        host_ifaces = mf['server_interfaces']
+    def _server_bond_index(self):
+        '''
+        Build the server bonds indexes in one pass over server_interfaces:
+        server -> bonds, (server, slave) -> bonds, (server, vid) -> bonds
+        and (rack, bond) -> servers.
+        '''
+        host_ifaces = self.mf['server_interfaces']
         mlag_bonds = self._mlag_bonds()
-        servers = inventory.hosts('server')
+        servers = set(self.inventory.hosts('server'))
 
-        is_rack_exist = True
-        is_bond_exist = True
-
-        _server_bonds = {}
+        index = ServerBondIndex(
+            collections.OrderedDict(), {}, {}, collections.defaultdict(list)
+        )
         for host, iface in host_ifaces.items():
-            if host in servers:
-                for idx, bond in enumerate(iface['bonds']):
-                    rack = 'rack' + str(bond['rack'])
-                    try:
-                        mlag_bonds[rack]
-                    except KeyError:
-                        is_rack_exist = False
-
-                    try:
-                        vids = mlag_bonds[rack][bond['name']]['vids']
-                    except KeyError:
-                        is_bond_exist = False
-
-                    if not is_rack_exist:
-                        raise AnsibleError(
-                            'rack not found: {} ({}) in {}'.format(
-                                rack, list(mlag_bonds.keys()), host)
-                            )
-                    elif not is_bond_exist:
-                        bonds = list(mlag_bonds[rack].keys())
-                        raise AnsibleError(
-                            'bond not found: {} ({}) in {}'.format(
-                                bond['name'], bonds, host)
-                            )
-                    bond.update({'vids': vids, 'index': idx})
-
-                _groupby = collections.defaultdict(list)
-                for k, v in itertools.groupby(iface['bonds'], lambda x: x[key]):
-                    list_v = list(v)
-                    if key == 'slaves' or key == 'vids':
-                        for item in filter.uncluster(k):
-                            _groupby[item].extend(list_v)
-                    else:
-                        _groupby[k].extend(list_v)
-
-                    _server_bonds[host] = _groupby
-            else:
-                raise AnsibleError(
-                    "%s not found in inventory file, "
-                    "check the master.yml in server_interfaces" % host
+            if host not in servers:
+                msg = ("%s not found in inventory file, "
+                       "check the master.yml in server_interfaces" % host)
+                self._error(
+                    'server_bonds', 'host not found',
+                    ['server_interfaces', host], functools.partial(str, msg)
                 )
-
-        return _server_bonds
-
+                continue
+
+            by_name = collections.defaultdict(list)
+            by_slave = collections.defaultdict(list)
+            by_vid = collections.defaultdict(list)
+            for idx, _bond in enumerate(iface['bonds']):
+                rack = 'rack' + str(_bond['rack'])
+                if rack not in mlag_bonds:
+                    msg = 'rack not found: {} ({}) in {}'.format(
+                        rack, list(mlag_bonds.keys()), host)
+                    self._error(
+                        'server_bonds', 'rack not found',
+                        ['server_interfaces', host, 'bonds', idx],
+                        functools.partial(str, msg)
+                    )
+                    continue
+                if _bond['name'] not in mlag_bonds[rack]:
+                    bonds = list(mlag_bonds[rack].keys())
+                    msg = 'bond not found: {} ({}) in {}'.format(
+                        _bond['name'], bonds, host)
+                    self._error(
+                        'server_bonds', 'bond not found',
+                        ['server_interfaces', host, 'bonds', idx],
+                        functools.partial(str, msg)
+                    )
+                    continue
+
+                bond = dict(_bond)
+                bond.update({
+                    'vids': mlag_bonds[rack][bond['name']]['vids'],
+                    'index': idx, 'host': host
+                })
+                by_name[bond['name']].append(bond)
+                for slave in filter.uncluster(bond['slaves']):
+                    by_slave[slave].append(bond)
+                for vid in filter.uncluster(bond['vids']):
+                    by_vid[vid].append(bond)
+                index.racks[(rack, bond['name'])].append(bond)
+
+            index.servers[host] = by_name
+            index.slaves[host] = by_slave
+            index.vids[host] = by_vid
+
+        return index
+
+    @validation('server_interfaces', 'mlag_bonds', 'vlans', hosts=True)
     def server_bonds(self):
-        server_bonds = self._server_bonds()
-        mlag_bonds = self._mlag_bonds()
+        index = self._server_bond_index()
 
-        bonds = []
-
-        for host in server_bonds:
-            for bond, v in server_bonds[host].items():
-                # Check for duplicate bonds per host
+        for host, server_bonds in index.servers.items():
+            # Check for duplicate bonds per host
+            for bond, v in server_bonds.items():
                 if len(v) > 1:
                     msg = 'multiple bond assignment: {} in {}'
-                    raise AnsibleError(msg.format(bond, host))
-
-                for item in v:
-                    rack = 'rack' + str(item['rack'])
-                    # Check if bond exist in rack per host
-                    if item['name'] not in mlag_bonds[rack]:
-                        racks = list(mlag_bonds[rack].keys())
-                        raise AnsibleError(
-                            "bond not found: {} ({}) in {}".format(
-                                item['name'], racks, host)
-                        )
-                    item.update({'host': host})
-                bonds.extend(v)
+                    self._error(
+                        'server_bonds', 'multiple bond assignment',
+                        ['server_interfaces', host, bond],
+                        functools.partial(msg.format, bond, host)
+                    )
 
             # Check for duplicate bond slaves per host
-            for slave, v in self._server_bonds(key='slaves')[host].items():
+            for slave, v in index.slaves[host].items():
                 if len(v) > 1:
                     bonds = [i['name'] for i in v]
                     msg = "multiple bond slaves assignment: {} ({}) in {}"
-                    raise AnsibleError(msg.format(slave, bonds, host))
+                    self._error(
+                        'server_bonds', 'multiple bond slaves assignment',
+                        ['server_interfaces', host, slave],
+                        functools.partial(msg.format, slave, bonds, host)
+                    )
 
             # Check for multiple vlan assignments per host
-            for vid, v in self._server_bonds(key='vids')[host].items():
+            for vid, v in index.vids[host].items():
                 if len(v) > 1:
                     msg = "multiple bond vlans assignment: {} ({}) in {}"
                     bonds = [i['name'] for i in v]
-                    raise AnsibleError(msg.format('vlan' + vid, bonds, host))
+                    self._error(
+                        'server_bonds', 'multiple bond vlans assignment',
+                        ['server_interfaces', host, 'vlan' + vid],
+                        functools.partial(
+                            msg.format, 'vlan' + vid, bonds, host
+                        )
+                    )
 
         # Check for multiple bond assignment per rack
-        for k, v in itertools.groupby(bonds, lambda x: x['rack']):
-            list_v = list(v)
-            y = collections.defaultdict(list)
-            for item in list_v:
-                y[item['name']].append(item)
-
-            for bond, _v in y.items():
-                if len(_v) > 1:
-                    hosts = [i['host'] for i in _v]
-                    msg = ('multiple bond assigment '
-                           'with the same rack: {} in ({})')
-                    raise AnsibleError(msg.format(bond, hosts))
-
-        return server_bonds
+        for (rack, bond), v in index.racks.items():
+            if len(v) > 1:
+                hosts = [i['host'] for i in v]
+                msg = ('multiple bond assigment '
+                       'with the same rack: {} in ({})')
+                self._error(
+                    'server_bonds',
+                    'multiple bond assigment with the same rack',
+                    ['mlag_bonds', rack, bond],
+                    functools.partial(msg.format, bond, hosts)
+                )
+
+        return index.servers
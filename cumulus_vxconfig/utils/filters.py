@@ -15,7 +15,15 @@ class Filters:
 
         return [convert(c) for c in re.split('(\\d+)', v)]
 
-    def yaml_format(self, data, style="", flow=None, start=True):
+    def yaml_format(self, data, style="", flow=None, start=True,
+                    share=False):
+        '''
+        Dump data as YAML. With 'share', the equal mappings and sequences
+        are written once with an anchor and referenced with aliases.
+        '''
+        if share:
+            data = self.share(data)
+
         return ruamel.yaml.dump(
             data, Dumper=ruamel.yaml.RoundTripDumper,
             block_seq_indent=2, indent=4,
@@ -23,6 +31,105 @@ class Filters:
             explicit_start=start,
             )
 
+    def share(self, data):
+        '''
+        Return a copy of data where the equal (non empty) dicts and lists
+        are the same object, e.g. the bonds of the two leafs of a rack:
+        {'leaf01': {'bonds': [...]}, 'leaf02': {'bonds': [...]}}
+        -> data['leaf01']['bonds'] is data['leaf02']['bonds']
+        Tuples become lists and ordered dicts become dicts.
+        '''
+        interned = {}
+
+        def key(v):
+            if isinstance(v, (dict, list)):
+                return id(v)
+            return type(v).__name__, v
+
+        def _share(v):
+            if isinstance(v, dict):
+                items = [(k, _share(_v)) for k, _v in v.items()]
+                ikey = ('dict', tuple((k, key(_v)) for k, _v in items))
+                new = dict(items)
+            elif isinstance(v, (list, tuple)):
+                items = [_share(_v) for _v in v]
+                ikey = ('list', tuple(key(_v) for _v in items))
+                new = items
+            else:
+                return v
+
+            if not items:
+                return new
+            return interned.setdefault(ikey, new)
+
+        return _share(data)
+
+    def json_ref(self, data):
+        '''
+        Return the normalised form of data where the structures found more
+        than once are written once in 'refs' and replaced by a reference
+        (their index in 'refs'):
+        {
+            "refs": [{"name": "bond01", ...}, [{"$ref": 0}, ...]],
+            "data": {"leaf01": {"$ref": 1}, "leaf02": {"$ref": 1}}
+        }
+        A ref only references the refs before it. See 'resolve_json_ref'.
+        '''
+        data = self.share(data)
+
+        counts = collections.Counter()
+
+        def count(v):
+            if isinstance(v, (dict, list)) and v:
+                counts[id(v)] += 1
+                if counts[id(v)] == 1:
+                    for _v in (v.values() if isinstance(v, dict) else v):
+                        count(_v)
+
+        count(data)
+
+        refs, index = [], {}
+
+        def normalise(v):
+            if not isinstance(v, (dict, list)) or not v:
+                return v
+            if id(v) in index:
+                return {'$ref': index[id(v)]}
+
+            if isinstance(v, dict):
+                new = {k: normalise(_v) for k, _v in v.items()}
+            else:
+                new = [normalise(_v) for _v in v]
+
+            if counts[id(v)] > 1:
+                index[id(v)] = len(refs)
+                refs.append(new)
+                return {'$ref': index[id(v)]}
+            return new
+
+        return {'refs': refs, 'data': normalise(data)}
+
+    def resolve_json_ref(self, doc):
+        '''
+        Return the data of a 'json_ref' document, the references to the
+        same ref are the same object.
+        '''
+        refs = []
+
+        def resolve(v):
+            if isinstance(v, dict):
+                if len(v) == 1 and '$ref' in v:
+                    return refs[v['$ref']]
+                return {k: resolve(_v) for k, _v in v.items()}
+            elif isinstance(v, list):
+                return [resolve(_v) for _v in v]
+            return v
+
+        for ref in doc['refs']:
+            refs.append(resolve(ref))
+
+        return resolve(doc['data'])
+
     def combine(list_of_dicts):
         x = collections.defaultdict(dict)
         for item in list_of_dicts:
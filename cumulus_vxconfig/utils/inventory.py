@@ -0,0 +1,232 @@
+'''
+Lightweight parser of the Ansible INI and YAML inventory formats.
+
+Only the group to hosts membership is read, host and group variables are
+ignored. Anything the parser does not understand raises
+'InventoryParseError' so that the caller can fallback to Ansible's
+InventoryManager.
+'''
+import collections
+import os
+import re
+import string
+
+import yaml
+
+
+class InventoryParseError(ValueError):
+    pass
+
+
+_RANGE = re.compile(r'^(.*?)\[(.+?)\](.*)$')
+
+
+def expand_hostname(pattern):
+    '''
+    Expand a host pattern with ranges, same as Ansible:
+    'leaf[01:04]' -> ['leaf01', 'leaf02', 'leaf03', 'leaf04']
+    'node[a:c]' -> ['nodea', 'nodeb', 'nodec']
+    '''
+    match = _RANGE.match(pattern)
+    if match is None:
+        return [pattern]
+
+    head, nrange, tail = match.groups()
+    bounds = nrange.split(':')
+    if len(bounds) not in [2, 3]:
+        raise InventoryParseError('invalid host pattern: ' + pattern)
+
+    beg, end = bounds[:2]
+    step = int(bounds[2]) if len(bounds) == 3 else 1
+    if not beg:
+        beg = '0'
+
+    if beg.isdigit() and end.isdigit():
+        width = len(beg) if beg.startswith('0') else 0
+        seq = [
+            str(i).zfill(width)
+            for i in range(int(beg), int(end) + 1, step)
+        ]
+    elif (beg in string.ascii_letters and end in string.ascii_letters
+            and len(beg) == len(end) == 1):
+        letters = string.ascii_letters
+        seq = list(letters[letters.index(beg):letters.index(end) + 1:step])
+    else:
+        raise InventoryParseError('invalid host pattern: ' + pattern)
+
+    hosts = []
+    for item in seq:
+        for rest in expand_hostname(tail):
+            hosts.append(head + item + rest)
+    return hosts
+
+
+def _hostname(entry):
+    ''' Strip an optional ':port' from an inventory host entry '''
+    # IPv6 addresses have more than one ':' outside of the host ranges
+    if re.sub(r'\[.*?\]', '', entry).count(':') == 1:
+        name, port = entry.rsplit(':', 1)
+        if port.isdigit():
+            return name
+    return entry
+
+
+class _Groups:
+
+    def __init__(self):
+        self.hosts = collections.OrderedDict()
+        self.children = collections.OrderedDict()
+        self.all_hosts = collections.OrderedDict()
+
+    def add_group(self, group):
+        self.hosts.setdefault(group, collections.OrderedDict())
+        self.children.setdefault(group, [])
+
+    def add_host(self, host, group):
+        self.add_group(group)
+        self.hosts[group][host] = None
+        self.all_hosts[host] = None
+
+    def add_child(self, group, child):
+        self.add_group(group)
+        self.add_group(child)
+        if child not in self.children[group]:
+            self.children[group].append(child)
+
+    def _descendants(self, group):
+        # Breadth first, same order as Ansible's 'Group.get_descendants'
+        ordered, level = [group], [group]
+        while level:
+            level = [
+                child for parent in level for child in self.children[parent]
+            ]
+            level = list(collections.OrderedDict.fromkeys(
+                child for child in level if child not in ordered
+            ))
+            ordered.extend(level)
+        return ordered
+
+    def groups_dict(self):
+        ''' Same as 'InventoryManager.get_groups_dict' '''
+        grouped = set()
+        for group, hosts in self.hosts.items():
+            if group not in ['all', 'ungrouped']:
+                grouped.update(hosts)
+
+        groups = collections.OrderedDict()
+        groups['all'] = list(self.all_hosts)
+        groups['ungrouped'] = [
+            h for h in self.all_hosts if h not in grouped
+        ]
+        for group in self.hosts:
+            if group in ['all', 'ungrouped']:
+                continue
+            hosts = collections.OrderedDict()
+            for kid in self._descendants(group):
+                hosts.update(self.hosts[kid])
+            groups[group] = list(hosts)
+
+        return groups
+
+
+def _parse_ini(lines):
+    groups = _Groups()
+    group, state = 'ungrouped', 'hosts'
+
+    for lineno, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line[0] in '#;':
+            continue
+
+        if line.startswith('[') and line.endswith(']'):
+            section = line[1:-1].strip()
+            if ':' in section:
+                group, state = section.rsplit(':', 1)
+            else:
+                group, state = section, 'hosts'
+
+            if state not in ['hosts', 'children', 'vars']:
+                raise InventoryParseError(
+                    'unsupported section at line {}: {}'.format(lineno, line)
+                )
+            groups.add_group(group)
+            continue
+
+        if state == 'vars':
+            continue
+
+        entry = line.split('#')[0].split()[0]
+        if state == 'children':
+            groups.add_child(group, entry)
+        else:
+            for host in expand_hostname(_hostname(entry)):
+                groups.add_host(host, group)
+
+    return groups
+
+
+def _parse_yaml_group(groups, group, data):
+    groups.add_group(group)
+    if data is None:
+        return
+    if not isinstance(data, dict):
+        raise InventoryParseError('invalid group: ' + group)
+
+    for key, value in data.items():
+        if key == 'hosts':
+            if isinstance(value, dict):
+                entries = value.keys()
+            elif value is None:
+                entries = []
+            else:
+                raise InventoryParseError('invalid hosts in group: ' + group)
+            for entry in entries:
+                for host in expand_hostname(_hostname(str(entry))):
+                    groups.add_host(host, group)
+        elif key == 'children':
+            if value is None:
+                continue
+            if not isinstance(value, dict):
+                raise InventoryParseError(
+                    'invalid children in group: ' + group
+                )
+            for child, child_data in value.items():
+                groups.add_child(group, child)
+                _parse_yaml_group(groups, child, child_data)
+        elif key != 'vars':
+            raise InventoryParseError(
+                'unsupported key in group {}: {}'.format(group, key)
+            )
+
+
+def _parse_yaml(data):
+    groups = _Groups()
+    for group, group_data in data.items():
+        _parse_yaml_group(groups, group, group_data)
+
+    return groups
+
+
+def parse_inventory(path):
+    '''
+    Parse an INI or YAML inventory file and return the groups with their
+    hosts, same as 'InventoryManager.get_groups_dict'.
+    '''
+    if not os.path.isfile(path) or os.access(path, os.X_OK):
+        raise InventoryParseError('unsupported inventory source: ' + path)
+
+    with open(path, 'r') as f:
+        content = f.read()
+
+    try:
+        data = yaml.safe_load(content)
+    except yaml.YAMLError:
+        data = None
+
+    if isinstance(data, dict) and all(
+            isinstance(v, dict) or v is None for v in data.values()):
+        groups = _parse_yaml(data)
+    else:
+        groups = _parse_ini(content.splitlines())
+
+    return groups.groups_dict()
@@ -0,0 +1,119 @@
+'''
+Section-lazy master.yml. The file is split on its top-level keys and each
+section is only parsed, and validated against its schema (see
+cumulus_vxconfig.utils.schema), the first time it is accessed.
+'''
+import collections.abc
+import re
+import threading
+
+import yaml
+from ansible.errors import AnsibleError
+from cumulus_vxconfig.utils import schema
+
+
+_KEY = re.compile(r'^([A-Za-z_][\w-]*)\s*:(?:\s|$)')
+
+
+def _split_sections(text):
+    '''
+    Split a YAML document into its top-level sections, return None when
+    the document cannot be split safely (flow style, multiple documents).
+    '''
+    sections = collections.OrderedDict()
+    key = None
+    for line in text.splitlines(keepends=True):
+        match = _KEY.match(line)
+        if match is not None:
+            key = match.group(1)
+            sections[key] = [line]
+        elif not line.strip() or line.startswith('#'):
+            if key is not None:
+                sections[key].append(line)
+        elif line[0].isspace() or line.startswith('-'):
+            if key is None:
+                return None
+            sections[key].append(line)
+        elif line.rstrip() == '---' and key is None:
+            continue
+        else:
+            return None
+
+    return collections.OrderedDict(
+        (k, ''.join(v)) for k, v in sections.items()
+    )
+
+
+class MasterFile(collections.abc.Mapping):
+    '''
+    Read-only mapping of the master.yml top-level sections.
+
+    Sections that cannot be parsed on their own (e.g. aliases of an anchor
+    defined in another section) fallback to a parse of the whole file.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'r') as f:
+            self.text = f.read()
+
+        self._lock = threading.Lock()
+        self._chunks = _split_sections(self.text)
+        self._data = None if self._chunks is not None else self._load()
+        self._raw = {}
+        self._sections = {}
+
+    def _load(self):
+        data = yaml.safe_load(self.text)
+        return data if data is not None else {}
+
+    def _parse(self, key):
+        if self._data is None:
+            try:
+                section = yaml.safe_load(self._chunks[key])
+            except yaml.YAMLError:
+                section = None
+
+            if isinstance(section, dict) and list(section) == [key]:
+                return section[key]
+
+            self._data = self._load()
+
+        return self._data[key]
+
+    def raw(self, key):
+        ''' Return a section as parsed, not validated '''
+        with self._lock:
+            if key not in self._raw:
+                if key not in self:
+                    raise KeyError(key)
+                self._raw[key] = self._parse(key)
+            return self._raw[key]
+
+    def __getitem__(self, key):
+        try:
+            return self._sections[key]
+        except KeyError:
+            pass
+
+        value = self.raw(key)
+        errors = schema.validate_section(key, value)
+        if errors:
+            raise AnsibleError(schema.format_errors(errors))
+
+        with self._lock:
+            return self._sections.setdefault(key, value)
+
+    def __iter__(self):
+        if self._data is not None:
+            return iter(self._data)
+        return iter(self._chunks)
+
+    def __len__(self):
+        if self._data is not None:
+            return len(self._data)
+        return len(self._chunks)
+
+    def __contains__(self, key):
+        if self._data is not None:
+            return key in self._data
+        return key in self._chunks
@@ -0,0 +1,157 @@
+import collections
+import contextlib
+import os
+import resource
+import sys
+import threading
+import time
+
+PREFIX = 'cumulus_vxconfig_'
+
+# name: help, all the metrics are gauges (values of the last run)
+METRICS = collections.OrderedDict([
+    ('success', 'Whether the last run succeeded.'),
+    ('last_run_timestamp_seconds', 'Unix time of the end of the last run.'),
+    ('run_duration_seconds', 'Duration of the last run.'),
+    ('variable_duration_seconds',
+     'Duration of the computation of a configuration variable.'),
+    ('check_duration_seconds', 'Duration of a check of master.yml.'),
+    ('peak_rss_bytes', 'Peak resident set size of the process.'),
+    ('hosts', 'Hosts in the inventory.'),
+    ('links', "Links defined in 'network_links'."),
+    ('vlans', "VLANs defined in 'vlans'."),
+    ('allocations', 'Allocations performed in an allocation pool.'),
+    ('state_written_bytes', 'Bytes written to a state file.'),
+    ('cache_hits', 'Hits of a cache.'),
+    ('cache_misses', 'Misses of a cache.'),
+    ('cache_hit_ratio', 'Hit ratio of a cache.'),
+])
+
+
+class Metrics:
+    '''
+    Metrics of a run, held by the Project, written in the Prometheus text
+    format for the node_exporter textfile collector.
+
+    Example:
+        metrics.inc('allocations', pool='l3vni')
+        with metrics.timer('variable_duration_seconds', variable='vxlans'):
+            ...
+        metrics.collect(project)
+        metrics.write('/var/lib/node_exporter/cumulus_vxconfig.prom')
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.samples = collections.OrderedDict()
+
+    @staticmethod
+    def _key(name, labels):
+        if name not in METRICS:
+            raise KeyError('unknown metric: ' + name)
+        return name, tuple(sorted(labels.items()))
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.samples[self._key(name, labels)] = value
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + value
+
+    def get(self, name, **labels):
+        return self.samples.get(self._key(name, labels), 0)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        ''' Add the duration of the block to a metric '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc(name, time.perf_counter() - start, **labels)
+
+    def cache(self, name, hit):
+        ''' Count a hit or a miss of a cache '''
+        self.inc('cache_hits' if hit else 'cache_misses', cache=name)
+
+    def collect(self, project=None):
+        '''
+        Set the metrics of the end of a run: duration, peak RSS, the size
+        of the project, the hit ratio of the caches.
+        '''
+        self.set('run_duration_seconds', time.perf_counter() - self.started)
+        self.set('last_run_timestamp_seconds', time.time())
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+        self.set(
+            'peak_rss_bytes', rss if sys.platform == 'darwin' else rss * 1024
+        )
+
+        if project is not None:
+            self._collect_project(project)
+
+        # Hit ratios
+        with self.lock:
+            caches = sorted(set(
+                dict(labels)['cache'] for name, labels in self.samples
+                if name in ('cache_hits', 'cache_misses')
+            ))
+        for cache in caches:
+            hits = self.get('cache_hits', cache=cache)
+            total = hits + self.get('cache_misses', cache=cache)
+            self.set('cache_hit_ratio', hits / total, cache=cache)
+
+    def _collect_project(self, project):
+        try:
+            mf = project.master
+            topology = project.inventory.topology
+            self.set('hosts', len(topology.group_hosts.get('all', ())))
+            self.set('links', sum(
+                len(v.get('links', [])) for v in mf['network_links'].values()
+            ))
+            self.set('vlans', sum(len(v) for v in mf['vlans'].values()))
+        except Exception:
+            # The run failed on the project files, keep the other metrics
+            pass
+
+    def render(self):
+        ''' Return the metrics in the Prometheus text format '''
+        with self.lock:
+            samples = list(self.samples.items())
+
+        by_name = collections.defaultdict(list)
+        for (name, labels), value in samples:
+            by_name[name].append((labels, value))
+
+        lines = []
+        for name, _help in METRICS.items():
+            if name not in by_name:
+                continue
+
+            lines.append('# HELP {}{} {}'.format(PREFIX, name, _help))
+            lines.append('# TYPE {}{} gauge'.format(PREFIX, name))
+            for labels, value in sorted(by_name[name]):
+                _labels = ','.join(
+                    '{}="{}"'.format(k, str(v).replace('\\', '\\\\')
+                                     .replace('"', '\\"'))
+                    for k, v in labels
+                )
+                lines.append('{}{}{} {}'.format(
+                    PREFIX, name, '{' + _labels + '}' if _labels else '',
+                    repr(float(value))
+                ))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        '''
+        Write the metrics atomically, the textfile collector must never
+        read a partial file.
+        '''
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
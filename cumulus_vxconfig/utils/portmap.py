@@ -0,0 +1,49 @@
+import collections
+
+
+PortClaim = collections.namedtuple('PortClaim', ['source', 'name', 'item'])
+
+
+class PortMap:
+    '''
+    Per-device port occupancy: host -> port -> claims. Ports claimed on a
+    group are claimed on every host of the group. A port claimed twice is
+    recorded in 'conflicts' at once, so the conflicts of all the sources
+    are found in a single pass over the ports.
+
+    Parameters
+    ----------
+    inventory: Inventory
+        Used to expand the groups into hosts, the devices are taken as
+        they are when None.
+    '''
+    def __init__(self, inventory=None):
+        self.inventory = inventory
+        self.ports = collections.defaultdict(dict)
+        self.conflicts = collections.OrderedDict()
+
+    def _hosts(self, device):
+        if self.inventory is None:
+            return [device]
+        return self.inventory.hosts(device)
+
+    def claim(self, device, port, source, name, item=None):
+        '''
+        Claim a port of a device (or of every host of a group) for an item
+        of master.yml, e.g.:
+        claim('leaf', 'swp1', 'network_links', 'fabric', 'spine:swp1 -- ...')
+        claim('leaf01', 'swp1', 'mlag_bonds', 'rack01', 0)
+        '''
+        claim = PortClaim(source, name, item)
+        for host in self._hosts(device):
+            owners = self.ports[host].setdefault(port, [])
+            if claim in owners:
+                continue
+
+            owners.append(claim)
+            if len(owners) > 1:
+                self.conflicts[(host, port)] = owners
+
+    def owners(self, host, port):
+        ''' Return the claims of a host port '''
+        return list(self.ports.get(host, {}).get(port, []))
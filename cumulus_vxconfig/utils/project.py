@@ -0,0 +1,183 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+
+from ansible.errors import AnsibleError
+from cumulus_vxconfig.utils import File, Inventory, schema
+from cumulus_vxconfig.utils.metrics import Metrics
+
+PROJECT_FILES = ['master.yml', 'devices']
+
+
+def project_state_dir(path):
+    '''
+    Return the state directory of a project directory, unique per path:
+    ~/.cumulus_vxconfig/projects/<name>_<hash>
+    '''
+    path = os.path.abspath(path)
+    digest = hashlib.sha1(path.encode()).hexdigest()[:8]
+    return os.path.join(
+        File.default_state_dir(), 'projects',
+        '{}_{}'.format(os.path.basename(path), digest)
+    )
+
+
+def _shared_state_files():
+    '''
+    Return the state files of ~/.cumulus_vxconfig, the state directory
+    shared by the projects in earlier versions.
+    '''
+    shared = File.default_state_dir()
+    if not os.path.isdir(shared):
+        return []
+    return sorted(
+        os.path.join(shared, fname) for fname in os.listdir(shared)
+        if fname.endswith('.json')
+    )
+
+
+def migrate_state(project):
+    '''
+    Copy the state files of ~/.cumulus_vxconfig into the state directory of
+    a project, so that a fabric deployed with an earlier version keeps its
+    allocations. Only for the one project that used that directory, the
+    state directory of the project must not have state files yet. Return
+    the copied files.
+    '''
+    state_dir = project.state_dir
+    if os.path.isdir(state_dir) and any(
+            fname.endswith('.json') for fname in os.listdir(state_dir)):
+        raise AnsibleError(
+            'the state directory of the project is not empty: ' + state_dir
+        )
+
+    os.makedirs(state_dir, exist_ok=True)
+    copied = []
+    for path in _shared_state_files():
+        copied.append(shutil.copy2(path, state_dir))
+    return copied
+
+
+class Project:
+    '''
+    Context of a fabric project: the directory with master.yml and devices,
+    the state directory, and the parsed files and caches shared by the
+    ConfigVars and CheckVars built against it.
+
+    Parameters
+    ----------
+    path: str
+        Project directory, default to the current directory.
+    state_dir: str
+        Directory of the state files, default to the directory of the
+        project path (see 'project_state_dir'), the same whether the
+        project is run alone or with --projects. The state of earlier
+        versions, in ~/.cumulus_vxconfig, is only copied on request, see
+        'migrate_state'.
+    '''
+    _projects = {}
+    _projects_lock = threading.Lock()
+
+    def __init__(self, path=None, state_dir=None):
+        self.path = os.path.abspath(path or os.getcwd())
+        self.state_dir = state_dir or project_state_dir(self.path)
+        self.lock = threading.RLock()
+        self.cache = {}
+        self.metrics = Metrics()
+        self._inventory = None
+
+    def __repr__(self):
+        return 'Project({!r})'.format(self.path)
+
+    @classmethod
+    def default(cls):
+        ''' Return the project of the current directory, shared by callers '''
+        path = os.getcwd()
+        with cls._projects_lock:
+            if path not in cls._projects:
+                project = cls._projects[path] = cls(path)
+                if (not os.path.isdir(project.state_dir)
+                        and _shared_state_files()):
+                    msg = ("\033[1;35mWARNING: the state files are kept in "
+                           "{} per project, run with --migrate-state to "
+                           "copy the state of {} (earlier versions) into "
+                           "it")
+                    print(msg.format(
+                        project.state_dir, File.default_state_dir()
+                    ), file=sys.stderr)
+            return cls._projects[path]
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+    def file_path(self, fname):
+        return os.path.join(self.path, fname)
+
+    def signature(self):
+        ''' Modification time and size of master.yml and devices '''
+        signature = []
+        for fname in PROJECT_FILES:
+            try:
+                st = os.stat(self.file_path(fname))
+                signature.append((fname, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append((fname, None, None))
+        return tuple(signature)
+
+    @property
+    def master(self):
+        ''' The section-lazy master.yml, reloaded when the file changes '''
+        return File(project=self).masterfile
+
+    def schema_errors(self):
+        '''
+        Return the errors of the whole master.yml against its schema,
+        validated once per version of the file (the sections are also
+        validated one by one as they are loaded, see MasterFile).
+        '''
+        mf = self.master
+        with self.lock:
+            cached = self.cache.get('schema')
+            if cached is None or cached[0] is not mf:
+                with self.metrics.timer(
+                        'check_duration_seconds', check='schema'):
+                    cached = self.cache['schema'] = (mf, schema.validate(mf))
+            return cached[1]
+
+    @property
+    def inventory(self):
+        '''
+        The inventory, rebuilt when the devices or master.yml (for the rack
+        groups) change.
+        '''
+        with self.lock:
+            signature = self.signature()
+            if self._inventory is None or self._inventory[0] != signature:
+                self._inventory = (signature, Inventory(project=self))
+            return self._inventory[1]
+
+    def state(self, fname):
+        ''' Return a state file of the project '''
+        return File(fname, project=self)
+
+    def flush(self):
+        ''' Write the changed state files of the project '''
+        written = File.flush(self.state_dir)
+        for path, size in written.items():
+            self.metrics.inc(
+                'state_written_bytes', size, file=os.path.basename(path)
+            )
+
+    def reset(self):
+        '''
+        Flush and forget the state files and the caches, they are loaded
+        again on next use.
+        '''
+        with self.lock:
+            self.flush()
+            File.reset(self.state_dir)
+            self.cache.clear()
+            self._inventory = None
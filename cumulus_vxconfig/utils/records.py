@@ -0,0 +1,66 @@
+'''
+Compact record types of the intermediate data. Records are named tuples
+(no per-instance __dict__) and are only converted into dicts at the
+JSON/Ansible boundary with 'as_dict'.
+'''
+import collections
+
+
+LinkNode = collections.namedtuple(
+    'LinkNode', ['host', 'interface', 'neighbor', 'ngroup', 'ninterface']
+)
+
+Bond = collections.namedtuple(
+    'Bond', ['name', 'vids', 'clag_id', 'tenant', 'members', 'alias']
+)
+
+Bridge = collections.namedtuple('Bridge', ['mode', 'vids', 'bonds'])
+
+VxlanInterface = collections.namedtuple(
+    'VxlanInterface', ['alias', 'name', 'vlan', 'tenant', 'type', 'id', 'vid']
+)
+
+L2Svi = collections.namedtuple(
+    'L2Svi', ['name', 'ip', 'vip', 'vhwaddr', 'vrf', 'vlan', 'vid']
+)
+
+L3Svi = collections.namedtuple(
+    'L3Svi', ['router_mac', 'vrf', 'vlan', 'vid', 'vni']
+)
+
+Neighbor = collections.namedtuple(
+    'Neighbor', ['host', 'address', 'interface', 'group']
+)
+
+IpInterface = collections.namedtuple(
+    'IpInterface', ['ip', 'alias', 'vrf', 'neighbor']
+)
+
+UnnumberedInterface = collections.namedtuple(
+    'UnnumberedInterface', ['alias', 'vrf', 'neighbor']
+)
+
+# Fields that are left out of the dict when None
+OPTIONAL_FIELDS = {
+    'L3Svi': ('router_mac',),
+    'Neighbor': ('address',),
+}
+
+
+def as_dict(data):
+    '''
+    Convert records, and the dicts and lists that contains them, into
+    plain dicts.
+    '''
+    if isinstance(data, tuple) and hasattr(data, '_fields'):
+        optional = OPTIONAL_FIELDS.get(type(data).__name__, ())
+        return {
+            k: as_dict(v) for k, v in zip(data._fields, data)
+            if not (v is None and k in optional)
+        }
+    elif isinstance(data, dict):
+        return {k: as_dict(v) for k, v in data.items()}
+    elif isinstance(data, list):
+        return [as_dict(item) for item in data]
+
+    return data
@@ -0,0 +1,296 @@
+'''
+Schema of master.yml. The schema is compiled once, at import, into nested
+validator functions that check a section in a single pass and report
+every error with its path, e.g.:
+
+    network_links.fabric: missing 'interface_type'
+    vlans.tenant01[0].id: expected a string, got int (100)
+
+MasterFile validates each section the first time it is loaded, so a
+malformed section is rejected before a builder fails deep inside with a
+KeyError or a TypeError, without parsing the other sections. 'validate'
+checks the whole file at once, for --check.
+'''
+import collections
+
+import netaddr
+
+
+class SchemaError(collections.namedtuple('SchemaError', ['path', 'message'])):
+    ''' Error of master.yml against the schema, 'path' locates the item '''
+    __slots__ = ()
+
+    @property
+    def location(self):
+        location = ''
+        for key in self.path:
+            if isinstance(key, int):
+                location += '[{}]'.format(key)
+            else:
+                location += '.{}'.format(key) if location else str(key)
+        return location
+
+    def __str__(self):
+        return '{}: {}'.format(self.location, self.message)
+
+
+_TYPE_NAMES = {
+    str: 'a string', int: 'an integer', bool: 'a boolean',
+    dict: 'a mapping', list: 'a list',
+}
+
+
+def _got(value):
+    if isinstance(value, (dict, list)):
+        return type(value).__name__
+    return '{} ({!r})'.format(type(value).__name__, value)
+
+
+def _type(_type):
+    def validate(value, path, errors):
+        # bool is an int in Python but not in master.yml
+        if (not isinstance(value, _type)
+                or (_type is int and isinstance(value, bool))):
+            errors.append(SchemaError(path, 'expected {}, got {}'.format(
+                _TYPE_NAMES[_type], _got(value)
+            )))
+            return False
+        return True
+
+    return validate
+
+
+def string():
+    return _type(str)
+
+
+def integer(minimum=None, maximum=None):
+    is_int = _type(int)
+
+    def validate(value, path, errors):
+        if not is_int(value, path, errors):
+            return False
+        if ((minimum is not None and value < minimum)
+                or (maximum is not None and value > maximum)):
+            errors.append(SchemaError(path, '{} out of range {}-{}'.format(
+                value, minimum, maximum
+            )))
+            return False
+        return True
+
+    return validate
+
+
+def boolean():
+    return _type(bool)
+
+
+def enum(*choices):
+    def validate(value, path, errors):
+        if value not in choices:
+            errors.append(SchemaError(path, 'expected one of {}, got {}'.format(
+                ', '.join(choices), _got(value)
+            )))
+            return False
+        return True
+
+    return validate
+
+
+def one_of(*validators):
+    ''' The value is valid if any of the validators accepts it '''
+    def validate(value, path, errors):
+        _errors = []
+        for _validate in validators:
+            if _validate(value, path, _errors):
+                return True
+        errors.append(SchemaError(path, ' or '.join(
+            e.message for e in _errors if e.path == path
+        ) or _errors[0].message))
+        return False
+
+    return validate
+
+
+def cidr():
+    ''' An IP network string, e.g. '10.0.0.0/24' '''
+    is_str = string()
+
+    def validate(value, path, errors):
+        if not is_str(value, path, errors):
+            return False
+        try:
+            net = netaddr.IPNetwork(value)
+        except (netaddr.AddrFormatError, ValueError, TypeError):
+            errors.append(SchemaError(
+                path, 'invalid IP network: {!r}'.format(value)
+            ))
+            return False
+        if '/' not in value or net.ip != net.network:
+            errors.append(SchemaError(
+                path, 'invalid network prefix: {!r}'.format(value)
+            ))
+            return False
+        return True
+
+    return validate
+
+
+def seq(items):
+    ''' A list, each item validated by 'items' '''
+    is_list = _type(list)
+
+    def validate(value, path, errors):
+        if not is_list(value, path, errors):
+            return False
+        valid = True
+        for idx, item in enumerate(value):
+            valid = items(item, path + (idx,), errors) and valid
+        return valid
+
+    return validate
+
+
+def mapping(values, keys=None):
+    ''' A mapping of any keys, each value validated by 'values' '''
+    is_dict = _type(dict)
+
+    def validate(value, path, errors):
+        if not is_dict(value, path, errors):
+            return False
+        valid = True
+        for key, item in value.items():
+            if keys is not None and not keys(key, path + (key,), errors):
+                valid = False
+                continue
+            valid = values(item, path + (key,), errors) and valid
+        return valid
+
+    return validate
+
+
+def record(required=None, optional=None, extra=None):
+    '''
+    A mapping with known keys: the 'required' and 'optional' keys are
+    validated by their validator, the other keys by 'extra' if given
+    (they are accepted as they are otherwise).
+    '''
+    required = list((required or {}).items())
+    fields = dict(required)
+    fields.update(optional or {})
+    is_dict = _type(dict)
+
+    def validate(value, path, errors):
+        if not is_dict(value, path, errors):
+            return False
+        valid = True
+        for key, _ in required:
+            if key not in value:
+                errors.append(SchemaError(path, 'missing {!r}'.format(key)))
+                valid = False
+        for key, item in value.items():
+            _validate = fields.get(key, extra)
+            if _validate is not None:
+                valid = _validate(item, path + (key,), errors) and valid
+        return valid
+
+    return validate
+
+
+# Schema of the top-level sections of master.yml
+SCHEMA = collections.OrderedDict([
+    ('base_asn', mapping(integer(1, 4294967295))),
+    ('base_networks', record(
+        required={
+            'loopbacks': mapping(cidr()),
+            'vxlan_anycast': cidr(),
+            'vlans': cidr(),
+        },
+        extra=cidr(),
+    )),
+    ('vlans', mapping(seq(record(
+        required={'id': string(), 'name': string()},
+        optional={
+            'prefixlen': integer(0, 128),
+            'network_prefix': cidr(),
+            'allow_nat': boolean(),
+        },
+    )))),
+    ('vlans_allocation', record(optional={
+        'mode': enum('sequential', 'tenant_blocks'),
+        'prefixlen': integer(0, 128),
+    })),
+    ('mlag_bonds', mapping(seq(record(required={
+        'name': string(), 'members': string(), 'vids': string(),
+    })))),
+    ('mlag_peerlink_interfaces', string()),
+    ('network_links', mapping(record(
+        required={
+            'links': seq(string()),
+            'interface_type': enum('unnumbered', 'ip', 'sub_interface'),
+        },
+        optional={
+            'prefixlen': integer(0, 128),
+            'vrf': string(),
+            'vifs': seq(record(
+                required={'vid': one_of(integer(1, 4094), string())},
+                optional={'vrf': string()},
+            )),
+        },
+    ))),
+    ('ip_interfaces', mapping(seq(record(
+        required={
+            'name': string(), 'ip_address': string(), 'alias': string(),
+        },
+        optional={'ip_nat': string()},
+    )))),
+    ('gateway_address', string()),
+    ('server_interfaces', mapping(record(
+        required={
+            'mgmt_port': string(),
+            'bonds': seq(record(required={
+                'name': string(),
+                'rack': one_of(integer(), string()),
+                'slaves': string(),
+            })),
+        },
+    ))),
+])
+
+REQUIRED_SECTIONS = [
+    'base_asn', 'base_networks', 'vlans', 'mlag_bonds',
+    'mlag_peerlink_interfaces', 'network_links',
+]
+
+
+def validate_section(key, value):
+    ''' Validate a section of master.yml, return the list of SchemaError '''
+    errors = []
+    _validate = SCHEMA.get(key)
+    if _validate is not None:
+        _validate(value, (key,), errors)
+    return errors
+
+
+def validate(mf):
+    '''
+    Validate every section of a master.yml mapping (see MasterFile) and
+    return the list of SchemaError, for the reports of all the errors at
+    once (--check).
+    '''
+    errors = []
+    for key in REQUIRED_SECTIONS:
+        if key not in mf:
+            errors.append(SchemaError((key,), 'missing section'))
+
+    for key in SCHEMA:
+        if key in mf:
+            errors.extend(validate_section(key, mf.raw(key)))
+
+    return errors
+
+
+def format_errors(errors):
+    return "invalid master.yml, {} error(s):\n{}".format(
+        len(errors), '\n'.join('  ' + str(error) for error in errors)
+    )
@@ -25,6 +25,9 @@ setup(
         'napalm-vyos',
         'ruamel.yaml'
     ],
+    extras_require={
+        'numpy': ['numpy']
+    },
     classifiers=[
         'Programming Language :: Python :: 3.5',
         'License :: OSI Approved :: MIT License',
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+import yaml
+
+from cumulus_vxconfig.utils.project import Project
+
+DEVICES = '''\
+[spine]
+spine1
+spine2
+
+[leaf]
+leaf[1:4]
+
+[border]
+border1
+border2
+
+[edge]
+edge1
+
+[server]
+server1
+server2
+server3
+server4
+'''
+
+MASTER = '''\
+base_asn:
+  spine: 65000
+  leaf: 65100
+  border: 65200
+  edge: 65300
+
+base_networks:
+  loopbacks:
+    spine: '10.0.0.0/25'
+    border: '10.0.0.128/26'
+    edge: '10.0.0.192/26'
+    leaf: '10.0.1.0/24'
+  vxlan_anycast: '10.0.2.0/24'
+  vlans: '10.1.0.0/16'
+  external_connectivity: '10.255.0.0/24'
+  oob_management: '172.24.0.0/24'
+
+vlans:
+  tenant01:
+    - {id: '100', name: 'vlan100'}
+    - {id: '101', name: 'vlan101', prefixlen: 25}
+  tenant02:
+    - {id: '200', name: 'vlan200', allow_nat: true}
+    - {id: '201', name: 'vlan201'}
+
+mlag_bonds:
+  rack1:
+    - {name: server01, members: 'swp1', vids: '100-101'}
+    - {name: server02, members: 'swp2', vids: '200-201'}
+  rack2:
+    - {name: server03, members: 'swp1', vids: '100'}
+    - {name: server04, members: 'swp2', vids: '200'}
+
+mlag_peerlink_interfaces: 'swp49-50'
+
+network_links:
+  fabric:
+    links:
+      - 'spine:swp1 -- leaf:swp21'
+      - 'spine:swp23 -- border:swp23'
+    interface_type: unnumbered
+  external_connectivity:
+    links:
+      - 'edge:eth1 -- border:swp1'
+    interface_type: sub_interface
+
+ip_interfaces:
+  edge1:
+    - {name: eth0, ip_address: dhcp, alias: wan, ip_nat: outside}
+    - {name: eth3, ip_address: '172.24.0.254/24', alias: oob}
+
+gateway_address: '172.24.0.1'
+
+server_interfaces:
+  server1:
+    mgmt_port: eth0
+    bonds:
+      - {name: server01, rack: 1, slaves: 'eth1-2'}
+  server2:
+    mgmt_port: eth0
+    bonds:
+      - {name: server02, rack: 1, slaves: 'eth1-2'}
+  server3:
+    mgmt_port: eth0
+    bonds:
+      - {name: server03, rack: 2, slaves: 'eth1-2'}
+'''
+
+
+def write_project(path, devices=DEVICES, master=MASTER):
+    '''
+    Write a fabric project in 'path', 'master' is the text of master.yml
+    or a dict dumped as master.yml.
+    '''
+    os.makedirs(str(path), exist_ok=True)
+    with open(os.path.join(str(path), 'devices'), 'w') as f:
+        f.write(devices)
+    with open(os.path.join(str(path), 'master.yml'), 'w') as f:
+        if isinstance(master, dict):
+            yaml.safe_dump(master, f, default_flow_style=False)
+        else:
+            f.write(master)
+    return str(path)
+
+
+@pytest.fixture
+def master():
+    ''' The master.yml of the test fabric, as a dict to edit '''
+    return yaml.safe_load(MASTER)
+
+
+@pytest.fixture
+def make_project(tmp_path):
+    ''' Build a Project of a fabric with its own state directory '''
+    def make_project(devices=DEVICES, master=MASTER, name='fabric'):
+        path = write_project(tmp_path / name, devices, master)
+        return Project(path, state_dir=str(tmp_path / (name + '_state')))
+
+    return make_project
@@ -0,0 +1,49 @@
+from cumulus_vxconfig.capacity import address_capacity, capacity
+
+SPARSE = '''\
+[spine]
+spine[1:2]
+
+[leaf]
+leaf01
+leaf02
+leaf41
+leaf42
+
+[border]
+border[1:2]
+
+[edge]
+edge1
+
+[server]
+server[1:4]
+'''
+
+
+def test_address_capacity_by_index():
+    report = address_capacity('10.0.1.0/27', {'leaf01': 1, 'leaf29': 29})
+
+    assert report['size'] == 30
+    assert report['used'] == 2
+    assert report['highest_index'] == 29
+    assert report['free'] == 1
+    assert report['exhausted'] == []
+
+
+def test_sparse_inventory(make_project, master):
+    master['base_networks']['loopbacks']['leaf'] = '10.0.1.0/27'
+    report = capacity(make_project(devices=SPARSE, master=master))
+
+    leaf = report['networks']['loopbacks']['leaf']
+    assert leaf['used'] == 4
+    assert leaf['highest_index'] == 42
+    assert leaf['free'] == 0
+    assert leaf['utilization'] == 100.0
+    assert leaf['exhausted'] == ['leaf41', 'leaf42']
+
+    anycast = report['networks']['vxlan_anycast']
+    assert anycast['used'] == 2
+    assert anycast['highest_index'] == 21
+    assert anycast['free'] == 254 - 21
+    assert anycast['exhausted'] == []
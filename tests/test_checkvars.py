@@ -0,0 +1,76 @@
+import pytest
+
+from ansible.errors import AnsibleError
+
+from cumulus_vxconfig.utils.checkvars import CheckVars
+
+
+def test_no_errors(make_project):
+    assert CheckVars(make_project(), collect=True).check_all() == []
+
+
+def test_overlapping_links_in_group(make_project, master):
+    master['network_links']['fabric']['links'].append(
+        'spine:swp1 -- border:swp24'
+    )
+    errors = CheckVars(make_project(master=master), collect=True).check_all()
+
+    # spine:swp1-2 -- border:swp24-25 overlaps with the leafs links on
+    # the spines and with 'spine:swp23 -- border:swp23' on the borders,
+    # each overlap is reported once
+    assert [(e.check, e.path) for e in errors] == [
+        ('interfaces', ('interfaces', 'spine1', 'swp1')),
+        ('interfaces', ('interfaces', 'border1', 'swp24')),
+    ]
+    assert "overlapping interface: 'swp1'" in errors[0].message
+
+
+def test_overlapping_links_raise(make_project, master):
+    master['network_links']['fabric']['links'].append(
+        'spine:swp1 -- border:swp24'
+    )
+    with pytest.raises(AnsibleError, match="overlapping interface: 'swp1'"):
+        CheckVars(make_project(master=master)).check_all()
+
+
+def test_duplicate_links(make_project, master):
+    master['network_links']['fabric']['links'].append(
+        'spine:swp1 -- leaf:swp21'
+    )
+    errors = CheckVars(make_project(master=master), collect=True).check_all()
+
+    assert [(e.check, e.path) for e in errors] == [(
+        'interfaces', ('network_links', 'fabric', 'spine:swp1 -- leaf:swp21')
+    )]
+    assert "Duplicate link: 'spine:swp1 -- leaf:swp21'" in errors[0].message
+
+
+def test_check_all_collects_raised_errors(make_project, master, monkeypatch):
+    def broken(self):
+        raise AnsibleError('broken check\nmore details')
+
+    monkeypatch.setattr(CheckVars, 'broken', broken, raising=False)
+    monkeypatch.setattr(CheckVars, 'CHECKS', CheckVars.CHECKS + ['broken'])
+    master['network_links']['fabric']['links'].append(
+        'spine:swp1 -- leaf:swp21'
+    )
+    errors = CheckVars(make_project(master=master), collect=True).check_all()
+
+    assert [(e.check, e.title) for e in errors] == [
+        ('interfaces', "duplicate link: 'spine:swp1 -- leaf:swp21'"),
+        ('broken', 'broken check'),
+    ]
+    assert errors[1].message == 'broken check\nmore details'
+
+    with pytest.raises(AnsibleError, match='broken check'):
+        CheckVars(make_project(name='fabric2')).check_all()
+
+
+def test_group_overlap_reported_once(make_project, master):
+    # The peerlink of every leaf overlaps with the uplinks of every leaf
+    master['mlag_peerlink_interfaces'] = 'swp21-22'
+    errors = CheckVars(make_project(master=master), collect=True).check_all()
+
+    assert [(e.check, e.path) for e in errors] == [
+        ('interfaces', ('interfaces', 'leaf1', 'swp21')),
+    ]
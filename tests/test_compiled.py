@@ -0,0 +1,68 @@
+import pytest
+
+from cumulus_vxconfig import compiled
+from cumulus_vxconfig.compiled import (
+    CompiledSnapshot, host_vars, write_compiled
+)
+from cumulus_vxconfig.export import host_variables
+
+
+@pytest.fixture
+def hosts(make_project, monkeypatch):
+    monkeypatch.setattr(compiled, '_snapshots', {})
+    return host_variables(make_project())
+
+
+@pytest.fixture
+def snapshot_file(hosts, tmp_path):
+    return write_compiled(hosts, str(tmp_path / 'snapshot.bin'))
+
+
+def test_round_trip(hosts, snapshot_file):
+    for host, variables in hosts.items():
+        assert host_vars(host, snapshot_file) == variables
+
+    with CompiledSnapshot(snapshot_file) as snapshot:
+        assert len(snapshot) == len(hosts)
+        assert snapshot.hosts() == sorted(hosts)
+
+
+def test_name_lookup(hosts, snapshot_file):
+    for host, variables in hosts.items():
+        for name, value in variables.items():
+            assert host_vars(host, snapshot_file, name=name) == value
+
+
+def test_missing_host(snapshot_file):
+    with pytest.raises(KeyError):
+        host_vars('leaf99', snapshot_file)
+
+    with CompiledSnapshot(snapshot_file) as snapshot:
+        assert 'leaf99' not in snapshot
+        assert 'leaf1' in snapshot
+
+
+def test_replaced_file_is_mapped_again(hosts, snapshot_file):
+    host_vars('leaf1', snapshot_file)
+    write_compiled({'leaf1': {'l3vni': {}}}, snapshot_file)
+
+    assert host_vars('leaf1', snapshot_file) == {'l3vni': {}}
+
+
+def test_bad_magic(snapshot_file):
+    with open(snapshot_file, 'r+b') as f:
+        f.write(b'CVXSNAP0')
+
+    with pytest.raises(ValueError, match='not a compiled snapshot'):
+        host_vars('leaf1', snapshot_file)
+
+
+@pytest.mark.parametrize('size', [0, 10, 100, -1])
+def test_truncated(snapshot_file, size):
+    with open(snapshot_file, 'rb') as f:
+        content = f.read()
+    with open(snapshot_file, 'wb') as f:
+        f.write(content[:size])
+
+    with pytest.raises(ValueError):
+        host_vars('leaf1', snapshot_file)
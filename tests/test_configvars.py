@@ -0,0 +1,33 @@
+from cumulus_vxconfig.export import host_variables
+
+DEVICES = '''\
+[spine]
+spine[1:2]
+
+[leaf]
+leaf[01:10]
+
+[border]
+border[1:2]
+
+[edge]
+edge1
+
+[server]
+server[1:4]
+'''
+
+
+def test_mlag_peerlink_single_leaf(make_project, master):
+    # leaf03 has no peer, the leafs after it keep their peerlink
+    master['mlag_bonds']['rack3'] = [
+        {'name': 'server05', 'members': 'swp1', 'vids': '100'}
+    ]
+    devices = DEVICES.replace(
+        'leaf[01:10]', 'leaf01\nleaf02\nleaf03\nleaf05\nleaf06'
+    )
+    hosts = host_variables(
+        make_project(devices=devices, master=master), names=['mlag_peerlink']
+    )
+
+    assert sorted(hosts) == ['leaf01', 'leaf02', 'leaf05', 'leaf06']
@@ -0,0 +1,64 @@
+import pytest
+
+from cumulus_vxconfig.utils import Host
+
+
+@pytest.mark.parametrize('host, peer', [
+    ('leaf01', 'leaf02'),
+    ('leaf02', 'leaf01'),
+    ('leaf09', 'leaf10'),
+    ('leaf10', 'leaf09'),
+    ('leaf1', 'leaf2'),
+    ('leaf2', 'leaf1'),
+])
+def test_peer_host(host, peer):
+    assert Host(host).peer_host == peer
+
+
+@pytest.mark.parametrize('host, peers', [
+    ('leaf01', ['leaf02']),
+    ('leaf10', ['leaf09', 'leaf9']),
+    ('leaf9', ['leaf10']),
+    ('leaf11', ['leaf12']),
+])
+def test_peer_hosts(host, peers):
+    assert Host(host).peer_hosts == peers
+
+
+@pytest.mark.parametrize('host, rack', [
+    ('leaf01', 'rack1'),
+    ('leaf02', 'rack1'),
+    ('leaf09', 'rack5'),
+    ('leaf10', 'rack5'),
+    ('leaf1', 'rack1'),
+])
+def test_rack(host, rack):
+    assert Host(host).rack == rack
+
+
+def test_mlag_peerlink_zero_padded(make_project):
+    from cumulus_vxconfig.configvars import ConfigVars
+
+    devices = '[spine]\nspine[1:2]\n\n[leaf]\nleaf[01:04]\n\n[border]\n' \
+        'border[1:2]\n\n[edge]\nedge1\n\n[server]\nserver[1:4]\n'
+    peerlink = ConfigVars(make_project(devices=devices)).mlag_peerlink()
+
+    assert sorted(peerlink) == ['leaf01', 'leaf02', 'leaf03', 'leaf04']
+    assert peerlink['leaf01']['priority'] == '1000'
+    assert peerlink['leaf02']['priority'] == '2000'
+
+
+def test_mlag_peerlink_unpadded(make_project, master):
+    from cumulus_vxconfig.configvars import ConfigVars
+
+    master['mlag_bonds']['rack5'] = [
+        {'name': 'server05', 'members': 'swp1', 'vids': '100'}
+    ]
+    devices = '[spine]\nspine[1:2]\n\n[leaf]\nleaf[1:10]\n\n[border]\n' \
+        'border[1:2]\n\n[edge]\nedge1\n\n[server]\nserver[1:4]\n'
+    _configvars = ConfigVars(make_project(devices=devices, master=master))
+    peerlink = _configvars.mlag_peerlink()
+
+    assert _configvars.inventory.topology.mlag_peer['leaf10'] == 'leaf9'
+    assert peerlink['leaf10']['priority'] == '2000'
+    assert peerlink['leaf9']['priority'] == '1000'
@@ -0,0 +1,34 @@
+import pytest
+
+from ansible.errors import AnsibleError
+
+from cumulus_vxconfig.utils import Network
+
+
+@pytest.mark.parametrize('network, index, ip', [
+    ('10.0.0.0/29', 1, '10.0.0.1/29'),
+    ('10.0.0.0/29', 6, '10.0.0.6/29'),
+    # index 0 is the last address, negative indexes count back from it
+    ('10.0.0.0/29', 0, '10.0.0.6/29'),
+    ('10.0.0.0/29', -1, '10.0.0.5/29'),
+    ('10.0.0.0/29', -5, '10.0.0.1/29'),
+    ('10.0.0.0/31', 1, '10.0.0.0/31'),
+    ('10.0.0.0/31', 2, '10.0.0.1/31'),
+    ('2001:db8::/126', 1, '2001:db8::1/126'),
+    ('2001:db8::/126', 0, '2001:db8::3/126'),
+])
+def test_get_ip(network, index, ip):
+    assert Network(network).get_ip(index) == ip
+
+
+def test_get_ip_formats():
+    net = Network('10.0.1.0/24')
+
+    assert net.get_ip(41, lo=True) == '10.0.1.41/32'
+    assert net.get_ip(41, addr=True) == '10.0.1.41'
+
+
+@pytest.mark.parametrize('index', [7, 100, -6, -100])
+def test_get_ip_out_of_range(index):
+    with pytest.raises(AnsibleError, match='Run out of IP addresses'):
+        Network('10.0.0.0/29').get_ip(index)
@@ -0,0 +1,96 @@
+import json
+import os
+
+import pytest
+
+from ansible.errors import AnsibleError
+
+from cumulus_vxconfig import projects
+from cumulus_vxconfig.configvars import ConfigVars
+from cumulus_vxconfig.utils import File
+from cumulus_vxconfig.utils.project import (
+    Project, migrate_state, project_state_dir
+)
+
+from conftest import write_project
+
+VARIABLES = ['l3vni', 'vxlans', 'mlag_bonds', 'vlans_interface']
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    ''' The shared state directory, ~/.cumulus_vxconfig '''
+    home = str(tmp_path / 'home')
+    monkeypatch.setattr(File, 'default_state_dir', staticmethod(lambda: home))
+    return home
+
+
+def variables(project):
+    configvars = ConfigVars(project)
+    result = {name: getattr(configvars, name)() for name in VARIABLES}
+    project.flush()
+    return result
+
+
+def test_state_dir_per_project(tmp_path, home):
+    path = write_project(tmp_path / 'fabric')
+
+    assert Project(path).state_dir == project_state_dir(path)
+    assert projects.open_project(path).state_dir == project_state_dir(path)
+    assert project_state_dir(path).startswith(os.path.join(home, 'projects'))
+
+
+def test_projects_and_single_mode_agree(tmp_path, home, master):
+    path = write_project(tmp_path / 'fabric', master=master)
+    single = variables(Project(path))
+
+    [(_, batch)] = projects.run_projects(
+        [path], projects.config_variable, processes=1, name='l3vni'
+    )
+    assert batch == {'ok': True, 'result': single['l3vni']}
+    assert variables(Project(path)) == single
+
+
+def test_migrate_state(tmp_path, home, master):
+    # A fabric deployed with the shared state directory of the earlier
+    # versions: tenant01 keeps the L3VNI allocated after tenant00's one
+    path = str(tmp_path / 'fabric')
+    deployed = dict(master, vlans=dict(
+        [('tenant00', [{'id': '300', 'name': 'vlan300'}])],
+        **master['vlans']
+    ))
+    write_project(path, master=deployed)
+    variables(Project(path, state_dir=home))
+    write_project(path, master=master)
+    expected = variables(Project(path, state_dir=home))
+    assert expected['l3vni']['border1']['tenant01'] == '4001'
+
+    project = Project(path)
+    copied = [os.path.basename(f) for f in migrate_state(project)]
+    assert 'l3vni.json' in copied
+    assert variables(project) == expected
+
+    with pytest.raises(AnsibleError, match='not empty'):
+        migrate_state(Project(path))
+
+
+def test_projects_do_not_share_state(tmp_path, home, master):
+    # Two fabrics with the same VLAN names in different base networks, the
+    # first one deployed with the shared state directory
+    first = write_project(tmp_path / 'first', master=master)
+    variables(Project(first, state_dir=home))
+
+    master['base_networks']['vlans'] = '10.2.0.0/16'
+    second = write_project(tmp_path / 'second', master=master)
+    expected = variables(
+        Project(second, state_dir=str(tmp_path / 'isolated'))
+    )
+
+    results = dict(projects.run_projects(
+        [first, second], projects.config_variable, processes=1,
+        name='vlans_interface'
+    ))
+    assert results[second] == {
+        'ok': True, 'result': expected['vlans_interface']
+    }
+    assert '10.2.' in json.dumps(results[second]['result'])
@@ -0,0 +1,36 @@
+import pytest
+
+from ansible.errors import AnsibleError
+
+from cumulus_vxconfig.configvars import ConfigVars
+from cumulus_vxconfig.utils.checkvars import CheckVars
+
+
+def test_sections_validated_lazily(make_project, master):
+    master['vlans']['tenant01'][0]['id'] = 100
+    configvars = ConfigVars(make_project(master=master))
+
+    # Only the sections used by a variable are parsed and validated
+    assert configvars.loopback_ips()
+    assert 'vlans' not in configvars.mf._raw
+    assert sorted(configvars.mf._sections) == ['base_networks']
+
+    with pytest.raises(AnsibleError) as err:
+        configvars.vxlans()
+    assert 'vlans.tenant01[0].id: expected a string, got int (100)' in str(
+        err.value
+    )
+
+
+def test_check_reports_all_schema_errors(make_project, master):
+    master['vlans']['tenant01'][0]['id'] = 100
+    del master['network_links']['fabric']['interface_type']
+    del master['mlag_bonds']['rack1'][0]['members']
+    errors = CheckVars(make_project(master=master), collect=True).check_all()
+
+    assert [(e.check, e.path) for e in errors] == [
+        ('schema', ('schema', 'vlans', 'tenant01', 0, 'id')),
+        ('schema', ('schema', 'mlag_bonds', 'rack1', 0)),
+        ('schema', ('schema', 'network_links', 'fabric')),
+    ]
+    assert errors[2].message == "network_links.fabric: missing 'interface_type'"
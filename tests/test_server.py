@@ -0,0 +1,49 @@
+import gc
+import os
+import socket
+
+import pytest
+
+from ansible.errors import AnsibleError
+
+from cumulus_vxconfig.configvars import ConfigVars
+from cumulus_vxconfig.server import ConfigServer, remove_stale_socket
+
+
+def test_remove_stale_socket_keeps_files(tmp_path):
+    path = str(tmp_path / 'master.yml')
+    with open(path, 'w') as f:
+        f.write('vlans: {}\n')
+
+    with pytest.raises(AnsibleError, match='not a socket'):
+        remove_stale_socket(path)
+    assert os.path.exists(path)
+
+
+def test_remove_stale_socket_keeps_live_socket(tmp_path):
+    path = str(tmp_path / 'live.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        server.listen(1)
+        with pytest.raises(AnsibleError, match='already listening'):
+            remove_stale_socket(path)
+        assert os.path.exists(path)
+
+
+def test_remove_stale_socket(tmp_path):
+    path = str(tmp_path / 'stale.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+
+    remove_stale_socket(path)
+    assert not os.path.exists(path)
+    remove_stale_socket(path)
+
+
+def test_refresh_releases_configvars(make_project):
+    server = ConfigServer(make_project())
+    assert server.results['loopback_ips']['ok']
+
+    # The ConfigVars of a refresh is not kept alive by a method cache
+    gc.collect()
+    assert not [o for o in gc.get_objects() if isinstance(o, ConfigVars)]
@@ -0,0 +1,37 @@
+import os
+
+from ansible.inventory.manager import InventoryManager
+from ansible.parsing.dataloader import DataLoader
+
+from cumulus_vxconfig.export import host_variables
+from cumulus_vxconfig.snapshot import diff_hosts, limit
+
+
+def limited_hosts(path, pattern):
+    inventory = InventoryManager(
+        loader=DataLoader(), sources=[os.path.join(path, 'devices')]
+    )
+    inventory.subset(pattern)
+    return sorted(h.name for h in inventory.get_hosts('all'))
+
+
+def test_limit_changed_hosts(make_project):
+    project = make_project()
+    hosts = host_variables(project)
+    old = {h: dict(v) for h, v in hosts.items()}
+    old['leaf1'] = {}
+
+    pattern = limit(diff_hosts(old, hosts))
+
+    assert pattern == 'leaf1'
+    assert limited_hosts(project.path, pattern) == ['leaf1']
+
+
+def test_limit_no_changes_matches_no_host(make_project):
+    project = make_project()
+    hosts = host_variables(project)
+
+    pattern = limit(diff_hosts(hosts, hosts))
+
+    assert pattern
+    assert limited_hosts(project.path, pattern) == []
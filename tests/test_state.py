@@ -0,0 +1,24 @@
+import os
+
+from cumulus_vxconfig.capacity import capacity
+from cumulus_vxconfig.export import host_variables
+from cumulus_vxconfig.utils import File
+
+
+def test_read_only_run_writes_nothing(make_project):
+    project = make_project()
+    capacity(project)
+    project.state('l3vni').data
+
+    assert File.flush(project.state_dir) == {}
+    assert os.listdir(project.state_dir) == []
+
+
+def test_unchanged_state_writes_nothing(make_project):
+    project = make_project()
+    host_variables(project)
+    assert File.flush(project.state_dir)
+
+    project.reset()
+    host_variables(project)
+    assert File.flush(project.state_dir) == {}